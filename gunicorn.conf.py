@@ -0,0 +1,93 @@
+"""Gunicorn configuration for urlshortener.
+
+Every value can be overridden from the environment. With preloading (the
+default) the app is imported and the caches are warmed once in the master,
+then shared copy-on-write with the forked workers. Without a shared
+CACHE_BACKEND a single worker is started; more than one requires it.
+"""
+import gc
+import multiprocessing
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'urlshortener.settings')
+
+wsgi_app = 'urlshortener.wsgi:application'
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+
+# الكاش الافتراضي (LocMemCache) داخل العملية، فالإعداد الافتراضي عامل واحد؛ عدة عمال
+# بعد ضبط CACHE_BACKEND على كاش مشترك، و on_starting يرفض ما سوى ذلك
+_default_workers = multiprocessing.cpu_count() * 2 + 1 if os.environ.get('CACHE_BACKEND') else 1
+workers = int(os.environ.get('WEB_CONCURRENCY', _default_workers))
+threads = int(os.environ.get('GUNICORN_THREADS', '1'))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread' if threads > 1 else 'sync')
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+# إعادة تدوير العمال دورياً تحد من نمو الذاكرة؛ jitter يمنع إعادة تشغيلهم معاً
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '10000'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', '1000'))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+
+
+def _warm_up(log):
+    from shortener import warmup
+
+    try:
+        warmup.run()
+    except Exception:
+        # التسخين تحسين فقط؛ لا يمنع الإقلاع
+        log.exception('Cache warm-up failed')
+
+
+def on_starting(server):
+    if server.cfg.workers < 2:
+        return
+    import django
+
+    django.setup()
+    from shortener.checks import shared_cache_errors
+
+    # كاش داخل العملية مع عدة عمال: كل عامل يرى إخلاءاته وعداداته فقط
+    for error in shared_cache_errors():
+        raise RuntimeError(f'{error.msg} {error.hint}')
+
+
+def when_ready(server):
+    if not server.cfg.preload_app:
+        return
+    from django.db import connections
+
+    _warm_up(server.log)
+    # لا تُورَّث اتصالات قاعدة البيانات للعمال
+    connections.close_all()
+    # نقل كائنات الإقلاع إلى الجيل الدائم حتى لا يلمس جامع القمامة صفحاتها المشتركة
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    from shortener import metrics
+
+    # قيم المقاييس في الذاكرة موروثة من العملية الأم؛ كل عامل يبدأ من الصفر
+    metrics.reset()
+    if not worker.cfg.preload_app:
+        _warm_up(worker.log)
+
+
+def worker_exit(server, worker):
+    from shortener import metrics, ratelimit
+
+    try:
+        ratelimit.flush_usage()
+    except Exception:
+        server.log.exception('API usage flush failed in worker %s', worker.pid)
+    metrics.flush()
+
+
+def child_exit(server, worker):
+    from shortener import metrics
+
+    metrics.mark_process_dead(worker.pid)
@@ -2,7 +2,9 @@ from django.contrib import admin
 
 # Register your models here.
 from django.contrib import admin
-from .models import URL, UserProfile
+from django.db.models import Q
+from .models import URL, UserProfile, APIKey
+from .search import search_filter
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'bio')
@@ -11,6 +13,20 @@ class UserProfileAdmin(admin.ModelAdmin):
 @admin.register(URL)
 class URLAdmin(admin.ModelAdmin):
     list_display = ('short_code', 'original_url', 'click_count', 'created_at')
-    list_filter = ('created_at',)
+    list_filter = ('created_at', 'redirect_policy')
     search_fields = ('original_url', 'short_code')
-    readonly_fields = ('created_at', 'click_count')
\ No newline at end of file
+    readonly_fields = ('created_at', 'click_count')
+
+    def get_search_results(self, request, queryset, search_term):
+        # فهرس FTS5 بدل LIKE '%...%' على النصوص، مع مطابقة الرمز تماماً
+        if not search_term:
+            return queryset, False
+        term = search_term.strip()
+        return queryset.filter(search_filter(term) | Q(short_code=term) | Q(custom_alias=term)), False
+
+@admin.register(APIKey)
+class APIKeyAdmin(admin.ModelAdmin):
+    list_display = ('prefix', 'user', 'name', 'created_at', 'revoked_at')
+    list_filter = ('revoked_at',)
+    search_fields = ('prefix', 'user__username', 'name')
+    readonly_fields = ('prefix', 'key_hash', 'created_at')
\ No newline at end of file
@@ -0,0 +1,11 @@
+from .models import ClickAnalytics
+
+# حجم دفعات المعرفات؛ أقل من حد متغيرات SQLite
+ID_CHUNK_SIZE = 900
+
+
+def clicks_for_user(user_id):
+    """نقرات روابط المستخدم عبر ClickAnalytics.user (فهرس click_user_time_idx)،
+    دون ربط عبر قاعدتي البيانات ولا قائمة معرفات روابطه"""
+    return ClickAnalytics.objects.filter(user_id=user_id)
+
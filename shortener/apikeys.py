@@ -0,0 +1,103 @@
+import hmac
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .instrumentation import record_cache
+from .models import APIKey, UserProfile
+
+
+GENERATION_KEY = 'apikeys:generation'
+
+KeyIdentity = namedtuple('KeyIdentity', [
+    'key_id', 'user_id', 'profile_id', 'calls_limit', 'calls_count', 'calls_period',
+])
+
+
+class TTLCache:
+    """كاش محدود الحجم داخل العملية مع مدة صلاحية لكل عنصر"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_keys = TTLCache(
+    maxsize=getattr(settings, 'API_KEY_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'API_KEY_CACHE_TTL', 300),
+)
+
+
+def _bump():
+    # الكاش المشترك (مطلوب مع أكثر من عامل، shortener.E001) يبلغ بقية العمليات
+    cache.set(GENERATION_KEY, time.time_ns(), None)
+    _keys.clear()
+
+
+def invalidate():
+    """يُستدعى عند تعديل أو حذف مفتاح، بعد تثبيت المعاملة: يفرغ الكاش المحلي ويبلغ بقية العمليات"""
+    transaction.on_commit(_bump)
+
+
+def _load(raw_key):
+    key_hash = APIKey.hash_key(raw_key)
+    candidates = APIKey.objects.filter(
+        prefix=raw_key[:APIKey.PREFIX_LENGTH], revoked_at__isnull=True,
+    ).values_list('pk', 'user_id', 'key_hash')
+    for key_id, user_id, candidate_hash in candidates:
+        if hmac.compare_digest(candidate_hash, key_hash):
+            profile, _ = UserProfile.objects.get_or_create(user_id=user_id)
+            return KeyIdentity(
+                key_id, user_id, profile.pk,
+                profile.api_calls_limit, profile.api_calls_count, profile.api_calls_period,
+            )
+    return None
+
+
+def authenticate(raw_key):
+    """التحقق من مفتاح API؛ الطلبات المتكررة لا تلمس قاعدة البيانات.
+    تغيير حد الاستخدام في UserProfile يصل بعد API_KEY_CACHE_TTL على الأكثر"""
+    if not raw_key:
+        return None
+    # الجيل يُقرأ قبل التحميل: إلغاء أثناءه يعني إعادة التحميل في الطلب التالي
+    generation = cache.get(GENERATION_KEY)
+    cache_key = APIKey.hash_key(raw_key)
+    cached = _keys.get(cache_key)
+    if cached is not None and cached[0] == generation:
+        record_cache('api_key', True)
+        return cached[1]
+
+    record_cache('api_key', False)
+    identity = _load(raw_key)
+    if identity is not None:
+        _keys.set(cache_key, (generation, identity))
+    return identity
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# كاش لا تراه العمليات الأخرى: الإخلاء والعدادات تبقى داخل العامل الذي أجراها
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def shared_cache_errors():
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        f'The default cache ({backend}) is not shared between processes.',
+        hint=(
+            'Redirect cache eviction, dashboard invalidation and API rate limits only reach the worker '
+            'that made the change. Set CACHE_BACKEND and CACHE_LOCATION to redis, memcached or '
+            'the database cache when running more than one worker.'
+        ),
+        id='shortener.E001',
+    )]
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    return shared_cache_errors()
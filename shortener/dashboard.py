@@ -0,0 +1,111 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .analytics import clicks_for_user
+from .instrumentation import record_cache
+from .models import URL, LinkHealth, Notification
+
+
+CHART_DAYS = 30
+# حقول الروابط الأخيرة في الكاش: دون qr_code (نص كبير)، وكلمة المرور تصبح protected فقط
+RECENT_FIELDS = [
+    'id', 'short_code', 'custom_alias', 'domain_id', 'original_url', 'title', 'click_count', 'expires_at',
+    'password', 'category__name', 'category__color', 'category__icon',
+    'health__status_code', 'health__error', 'health__failures',
+]
+
+
+def cache_key(user_id, day=None):
+    # اليوم جزء من المفتاح لأن نافذة الرسم البياني تتحرك يومياً
+    return f'dashboard:{user_id}:{(day or timezone.localdate()).isoformat()}'
+
+
+def compute(user_id):
+    """إحصائيات لوحة التحكم وسلسلة الرسم البياني بعدد ثابت من الاستعلامات"""
+    now = timezone.now()
+    user_urls = URL.objects.filter(user_id=user_id)
+    stats = user_urls.aggregate(
+        total_urls=Count('id'),
+        total_clicks=Sum('click_count'),
+        active_urls=Count('id', filter=Q(is_active=True)),
+        expired_urls=Count('id', filter=Q(expires_at__lt=now)),
+    )
+    stats['total_clicks'] = stats['total_clicks'] or 0
+
+    first_day = timezone.localdate(now) - timedelta(days=CHART_DAYS)
+    days = [first_day + timedelta(days=i) for i in range(CHART_DAYS)]
+    start = timezone.make_aware(datetime.combine(first_day, time.min))
+    end = start + timedelta(days=CHART_DAYS)
+    per_day = dict(
+        clicks_for_user(user_id).filter(
+            clicked_at__gte=start, clicked_at__lt=end
+        ).annotate(day=TruncDate('clicked_at')).values_list('day').annotate(count=Count('id')).order_by()
+    )
+    daily_clicks = [{'date': day.strftime('%Y-%m-%d'), 'clicks': per_day.get(day, 0)} for day in days]
+
+    recent_urls = [_recent_link(row) for row in user_urls.values(*RECENT_FIELDS)[:10]]
+    return {'stats': stats, 'daily_clicks': daily_clicks, 'recent_urls': recent_urls}
+
+
+def _recent_link(row):
+    category = health = None
+    if row['category__name'] is not None:
+        category = {'name': row['category__name'], 'color': row['category__color'], 'icon': row['category__icon']}
+    # health: نتيجة آخر فحص للوجهة لإظهار الروابط المعطلة
+    if row['health__failures'] is not None:
+        health = {
+            'status_code': row['health__status_code'],
+            'error': row['health__error'],
+            'is_broken': row['health__failures'] >= LinkHealth.BROKEN_AFTER,
+        }
+    return {
+        'id': row['id'],
+        'short_code': row['short_code'],
+        'short_url': URL.short_url_for(row['custom_alias'] or row['short_code'], row['domain_id']),
+        'original_url': row['original_url'],
+        'title': row['title'],
+        'click_count': row['click_count'],
+        'expires_at': row['expires_at'],
+        'protected': bool(row['password']),
+        'category': category,
+        'health': health,
+    }
+
+
+def present_links(links, now=None):
+    """الروابط الأخيرة للعرض: حالة الانتهاء تُحسب عند العرض خارج الكاش.
+    رمز QR لا يُقرأ هنا؛ القالب يطلبه عند فتحه من views.url_qr_code"""
+    now = now or timezone.now()
+    return [
+        {**link, 'is_expired': link['expires_at'] is not None and now > link['expires_at']}
+        for link in links
+    ]
+
+
+def unread_notifications(user_id, limit=5):
+    """الإشعارات غير المقروءة؛ خارج الكاش لأن قراءتها تغيرها"""
+    return Notification.objects.filter(user_id=user_id, is_read=False)[:limit]
+
+
+def get(user_id):
+    """بيانات لوحة التحكم من الكاش، أو حسابها وتخزينها"""
+    key = cache_key(user_id)
+    data = cache.get(key)
+    record_cache('dashboard', data is not None)
+    if data is None:
+        data = compute(user_id)
+        cache.set(key, data, getattr(settings, 'DASHBOARD_CACHE_TTL', 60))
+    return data
+
+
+def invalidate(user_ids):
+    """حذف بيانات لوحة التحكم المخزنة للمستخدمين"""
+    today = timezone.localdate()
+    keys = {cache_key(user_id, today) for user_id in user_ids if user_id}
+    if keys:
+        cache.delete_many(keys)
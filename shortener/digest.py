@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import URL, ClickAnalytics
+
+
+WEEKLY_SUBJECT = 'تقريرك الأسبوعي - UrlPro'
+
+
+def weekly_message_body(username, clicks, active_links):
+    return f'''
+    مرحباً {username}،
+
+    إليك تقريرك الأسبوعي:
+
+    📊 إجمالي النقرات هذا الأسبوع: {clicks}
+    🔗 إجمالي الروابط النشطة: {active_links}
+
+    يمكنك مراجعة التفاصيل الكاملة في لوحة التحكم.
+
+    تحياتنا،
+    فريق UrlPro
+    '''
+
+
+def weekly_stats(user_ids=None, now=None):
+    """نقرات الأسبوع والروابط النشطة لكل المستخدمين باستعلامات مجمعة قليلة"""
+    since = (now or timezone.now()) - timedelta(days=7)
+    clicks = ClickAnalytics.objects.filter(clicked_at__gte=since, user__isnull=False)
+    active = URL.objects.filter(is_active=True, user__isnull=False)
+    if user_ids is not None:
+        clicks = clicks.filter(user_id__in=user_ids)
+        active = active.filter(user_id__in=user_ids)
+
+    weekly_clicks = dict(clicks.values_list('user_id').annotate(count=Count('id')).order_by())
+
+    active_links = dict(active.values_list('user_id').annotate(count=Count('id')).order_by())
+    return weekly_clicks, active_links
+
+
+def build_weekly_message(user, weekly_clicks, active_links, connection=None):
+    return EmailMessage(
+        WEEKLY_SUBJECT,
+        weekly_message_body(user.username, weekly_clicks.get(user.pk, 0), active_links.get(user.pk, 0)),
+        settings.DEFAULT_FROM_EMAIL,
+        [user.email],
+        connection=connection,
+    )
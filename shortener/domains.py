@@ -0,0 +1,95 @@
+"""جدول النطاقات في الذاكرة: ترويسة Host -> النطاق، ومعرف النطاق -> الاسم.
+
+الجدول صغير ويُحمَّل كاملاً باستعلام واحد. كل DOMAIN_MAP_REFRESH ثانية تقارن
+كل عملية بصمة الجدول في قاعدة البيانات (العدد، أكبر معرف، آخر تعديل) بالبصمة
+التي حمّلت بها، فلا تعتمد على كاش مشترك. الطلب على مضيف غير مسجل يُخدم من
+مساحة الرموز الافتراضية (domain = NULL).
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http.request import split_domain_port
+
+INACTIVE = object()
+
+
+class InactiveDomain(Exception):
+    pass
+
+
+_lock = threading.Lock()
+_state = None  # (البصمة، {المضيف: المعرف أو INACTIVE}، {المعرف: الاسم})
+_last_check = 0.0
+
+
+def normalize(host):
+    return split_domain_port(host)[0] or host.lower()
+
+
+def _signature():
+    from .models import Domain
+
+    # queryset.update() لا يحدّث updated_at؛ تعديلات النطاقات تمر عبر save()
+    return tuple(Domain.objects.aggregate(Count('id'), Max('id'), Max('updated_at')).values())
+
+
+def _load():
+    from .models import Domain
+
+    by_host, names = {}, {}
+    for pk, name, is_active in Domain.objects.values_list('id', 'name', 'is_active'):
+        by_host[normalize(name)] = pk if is_active else INACTIVE
+        names[pk] = name
+    return by_host, names
+
+
+def _current():
+    global _state, _last_check
+    if _state is None or time.monotonic() - _last_check >= settings.DOMAIN_MAP_REFRESH:
+        with _lock:
+            if _state is None or time.monotonic() - _last_check >= settings.DOMAIN_MAP_REFRESH:
+                # البصمة تُقرأ قبل التحميل: تعديل أثناءه يعني إعادة التحميل في الفحص التالي
+                signature = _signature()
+                if _state is None or _state[0] != signature:
+                    _state = (signature, *_load())
+                _last_check = time.monotonic()
+    return _state
+
+
+def prime():
+    """تحميل الجدول (عند الإقلاع)؛ يعيد عدد النطاقات"""
+    return len(_current()[2])
+
+
+def _reset():
+    global _state
+    _state = None
+
+
+def invalidate():
+    """بعد أي تعديل على النطاقات: العملية الحالية فور تثبيت المعاملة، والبقية عند فحص البصمة التالي"""
+    # قبل التثبيت قد تعيد العملية التحميل وترى الجدول القديم
+    transaction.on_commit(_reset)
+
+
+def for_host(host):
+    """معرف النطاق النشط للمضيف، أو None للمساحة الافتراضية؛ InactiveDomain إن كان معطلاً"""
+    domain_id = _current()[1].get(normalize(host))
+    if domain_id is INACTIVE:
+        raise InactiveDomain(host)
+    return domain_id
+
+
+def name_for(domain_id):
+    """اسم النطاق للروابط المختصرة؛ النطاق الافتراضي عند None"""
+    if domain_id is None:
+        return settings.DEFAULT_SHORT_DOMAIN
+    return _current()[2].get(domain_id, settings.DEFAULT_SHORT_DOMAIN)
+
+
+def scoped(code, domain_id):
+    # '/' لا يظهر في رمز من المسار، فلا تتداخل مفاتيح النطاقات مع المساحة الافتراضية
+    return code if domain_id is None else f'{domain_id}/{code}'
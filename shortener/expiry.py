@@ -0,0 +1,54 @@
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import dashboard, resolver
+from .models import URL, Notification, RedirectChange
+
+logger = logging.getLogger(__name__)
+
+
+def expire_due_urls(batch_size=1000, notify=True, now=None):
+    """تعطيل الروابط المنتهية على دفعات، وحذفها من الكاش، وإنشاء الإشعارات"""
+    now = now or timezone.now()
+    total = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                URL.objects.filter(is_active=True, expires_at__lte=now)
+                .only('id', 'short_code', 'custom_alias', 'user_id', 'domain_id')
+                .order_by('expires_at')[:batch_size]
+            )
+            if not batch:
+                break
+            URL.objects.filter(pk__in=[url.pk for url in batch]).update(is_active=False)
+            RedirectChange.record([url.pk for url in batch])
+            if notify:
+                Notification.objects.bulk_create([
+                    Notification(
+                        user_id=url.user_id,
+                        title='انتهت صلاحية رابط',
+                        message=f'انتهت صلاحية الرابط المختصر: {url.get_short_url()}',
+                        type='warning',
+                    )
+                    for url in batch if url.user_id
+                ])
+        codes = defaultdict(list)
+        for url in batch:
+            codes[url.domain_id] += [url.short_code, url.custom_alias]
+        for domain_id, domain_codes in codes.items():
+            resolver.evict(domain_codes, domain_id)
+        dashboard.invalidate({url.user_id for url in batch})
+        total += len(batch)
+    if total:
+        logger.info('Deactivated %d expired links', total)
+    return total
+
+
+def next_expiry():
+    """أقرب وقت انتهاء قادم بين الروابط النشطة"""
+    return URL.objects.filter(
+        is_active=True, expires_at__isnull=False
+    ).order_by('expires_at').values_list('expires_at', flat=True).first()
@@ -0,0 +1,112 @@
+import base64
+import csv
+import json
+from datetime import datetime, time
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .analytics import clicks_for_user
+from .models import ClickAnalytics
+from .utils import Echo, batch_chunks, gzip_stream
+
+
+CLICK_FIELDS = [
+    'id', 'url_id', 'clicked_at', 'ip_address', 'country', 'city',
+    'device_type', 'browser', 'os', 'referer', 'user_agent', 'is_unique',
+]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(clicked_at, pk):
+    raw = f'{clicked_at.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        stamp, pk = raw.rsplit('|', 1)
+        clicked_at = datetime.fromisoformat(stamp)
+        return clicked_at, int(pk)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+def parse_bound(value, end=False):
+    """تحويل تاريخ أو وقت نصي إلى وقت مع منطقة زمنية"""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date: {value}')
+        moment = datetime.combine(day, time.max if end else time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def after_cursor(clicked_at, pk):
+    # الشرط clicked_at >= ... منفصلاً يسمح لـ SQLite بالبحث في نطاق الفهرس بدل مسحه من بدايته
+    return Q(clicked_at__gte=clicked_at) & (Q(clicked_at__gt=clicked_at) | Q(id__gt=pk))
+
+
+def iter_clicks(queryset, start=None, end=None, cursor=None, batch_size=5000):
+    """المرور على النقرات بترتيب (clicked_at, id) على دفعات بذاكرة ثابتة"""
+    if start:
+        queryset = queryset.filter(clicked_at__gte=start)
+    if end:
+        queryset = queryset.filter(clicked_at__lte=end)
+    queryset = queryset.order_by('clicked_at', 'id').values(*CLICK_FIELDS)
+
+    last = decode_cursor(cursor) if cursor else None
+    while True:
+        page = queryset
+        if last:
+            page = page.filter(after_cursor(*last))
+        rows = list(page[:batch_size])
+        if not rows:
+            return
+        for row in rows:
+            row['cursor'] = encode_cursor(row['clicked_at'], row['id'])
+            yield row
+        last = (rows[-1]['clicked_at'], rows[-1]['id'])
+
+
+def render_ndjson(rows):
+    for row in rows:
+        row['clicked_at'] = row['clicked_at'].isoformat()
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def render_csv(rows, header=True):
+    writer = csv.writer(Echo())
+    if header:
+        yield writer.writerow(CLICK_FIELDS + ['cursor'])
+    for row in rows:
+        row['clicked_at'] = row['clicked_at'].isoformat()
+        yield writer.writerow([row[field] for field in CLICK_FIELDS] + [row['cursor']])
+
+
+def click_export_stream(queryset, fmt='ndjson', start=None, end=None, cursor=None, compress=False):
+    """تدفق تصدير النقرات؛ كل سطر يحمل cursor لاستئناف التنزيل"""
+    rows = iter_clicks(queryset, start=start, end=end, cursor=cursor)
+    if fmt == 'csv':
+        chunks = render_csv(rows, header=not cursor)
+    else:
+        chunks = render_ndjson(rows)
+    chunks = batch_chunks(chunks)
+    return gzip_stream(chunks) if compress else chunks
+
+
+def clicks_for(url=None, user=None):
+    queryset = ClickAnalytics.objects.all() if user is None else clicks_for_user(user.pk)
+    if url is not None:
+        queryset = queryset.filter(url=url)
+    return queryset
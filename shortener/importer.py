@@ -0,0 +1,241 @@
+"""استيراد الروابط بالجملة من CSV أو NDJSON.
+
+الملف يُقرأ كتدفق ويُعالج على دفعات: تحقق وإزالة تكرار داخل الدفعة، استعلام
+واحد لتعارض الرموز، ثم bulk_create في معاملة واحدة. الموضع (رقم السجل) بعد كل
+دفعة مثبتة يكفي للاستئناف. bulk_create لا يستدعي save()، فرمز QR يُولَّد عند
+أول عرض (URL.ensure_qr_code).
+"""
+import csv
+import io
+import json
+import re
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import dashboard, resolver, tags
+from .models import URL, RedirectChange, generate_short_code, parse_tags
+
+FORMATS = ('csv', 'ndjson')
+CHUNK_SIZE = 1000
+MAX_KEPT_ERRORS = 1000
+CHUNK_ATTEMPTS = 3
+ALIAS_RE = re.compile(r'[A-Za-z0-9_-]{1,50}')
+TRUE_VALUES = {'1', 'true', 'yes', 'on'}
+
+_validate_url = URLValidator()
+
+
+def detect_format(name):
+    return 'csv' if (name or '').lower().endswith('.csv') else 'ndjson'
+
+
+def read_records(stream, fmt):
+    """(الموضع، السجل) لكل سجل؛ السجل None إن تعذر تحليله"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        yield from enumerate(csv.DictReader(text), 1)
+        return
+    position = 0
+    for line in text:
+        if not line.strip():
+            continue
+        position += 1
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield position, record if isinstance(record, dict) else None
+
+
+def clean(record, now):
+    """تحويل سجل إلى حقول URL؛ ValueError برسالة الخطأ"""
+    if record is None:
+        raise ValueError('malformed record')
+    original_url = str(record.get('url') or record.get('original_url') or '').strip()
+    if not original_url:
+        raise ValueError('url is required')
+    if not original_url.startswith(('http://', 'https://')):
+        original_url = 'http://' + original_url
+    if len(original_url) > 2000:
+        raise ValueError('url is longer than 2000 characters')
+    try:
+        _validate_url(original_url)
+    except ValidationError:
+        raise ValueError('invalid url')
+
+    custom_alias = str(record.get('custom_alias') or record.get('alias') or '').strip() or None
+    if custom_alias and not ALIAS_RE.fullmatch(custom_alias):
+        raise ValueError('invalid custom_alias')
+    redirect_policy = record.get('redirect_policy') or URL.POLICY_TRACKED
+    if redirect_policy not in dict(URL.REDIRECT_POLICIES):
+        raise ValueError('invalid redirect_policy')
+
+    expires_at = None
+    if record.get('expires_at'):
+        expires_at = parse_datetime(str(record['expires_at']))
+        if expires_at is None:
+            raise ValueError('invalid expires_at')
+        if timezone.is_naive(expires_at):
+            expires_at = timezone.make_aware(expires_at)
+    elif record.get('expires_days'):
+        try:
+            expires_at = now + timedelta(days=int(record['expires_days']))
+        except (TypeError, ValueError):
+            raise ValueError('invalid expires_days')
+
+    tag_names = record.get('tags') or ''
+    if isinstance(tag_names, list):
+        tag_names = ','.join(str(name) for name in tag_names)
+    tag_names = ','.join(parse_tags(str(tag_names)))
+    if len(tag_names) > 500:
+        raise ValueError('tags are longer than 500 characters')
+
+    is_private = record.get('is_private')
+    if not isinstance(is_private, bool):
+        is_private = str(is_private or '').strip().lower() in TRUE_VALUES
+    return {
+        'original_url': original_url,
+        'custom_alias': custom_alias,
+        'title': str(record.get('title') or '')[:200],
+        'description': str(record.get('description') or ''),
+        'tags': tag_names,
+        'expires_at': expires_at,
+        'redirect_policy': redirect_policy,
+        'is_private': is_private,
+    }
+
+
+class ImportResult:
+    def __init__(self, position=0):
+        self.position = position  # آخر سجل مثبت أو مرفوض
+        self.done = True  # False إن توقف عند limit قبل نهاية الملف
+        self.created = 0
+        self.error_count = 0
+        self.errors = []  # أول MAX_KEPT_ERRORS خطأ فقط
+
+    def add_error(self, position, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_KEPT_ERRORS:
+            self.errors.append((position, message))
+
+    def as_dict(self):
+        return {
+            'position': self.position,
+            'done': self.done,
+            'created': self.created,
+            'error_count': self.error_count,
+            'errors': [{'position': position, 'error': message} for position, message in self.errors],
+        }
+
+
+def _taken(codes):
+    # الرمز والاسم المخصص يتشاركان مساحة أسماء النطاق الافتراضي في resolver
+    taken = set()
+    for short_code, custom_alias in URL.objects.filter(
+        Q(short_code__in=codes) | Q(custom_alias__in=codes, domain__isnull=True)
+    ).values_list('short_code', 'custom_alias'):
+        taken.update((short_code, custom_alias))
+    return taken
+
+
+def _save_chunk(user_id, rows, on_error):
+    """rows: [(الموضع، الحقول)]؛ يعيد عدد الروابط المنشأة"""
+    codes = [generate_short_code() for _ in rows]
+    taken = _taken(codes + [fields['custom_alias'] for _, fields in rows if fields['custom_alias']])
+    now = timezone.now()
+    objects = []
+    for (position, fields), code in zip(rows, codes):
+        alias = fields['custom_alias']
+        if alias and alias in taken:
+            on_error(position, f'custom_alias "{alias}" is already taken')
+            continue
+        while code in taken:
+            code = generate_short_code()
+        taken.update((code, alias))
+        objects.append(URL(user_id=user_id, short_code=code, created_at=now, **fields))
+    if not objects:
+        return 0
+
+    with transaction.atomic():
+        URL.objects.bulk_create(objects)
+        if objects[0].pk is None:
+            # قواعد لا تعيد المفاتيح من الإدراج الجماعي
+            pks = dict(URL.objects.filter(short_code__in=[obj.short_code for obj in objects]).values_list('short_code', 'pk'))
+            for obj in objects:
+                obj.pk = pks[obj.short_code]
+        if user_id:
+            tags.link(user_id, {obj.pk: obj.get_tags_list() for obj in objects if obj.tags})
+        RedirectChange.record(obj.pk for obj in objects)
+    # قد يكون أحد الرموز في الكاش السلبي من طلب سابق
+    resolver.evict([code for obj in objects for code in (obj.short_code, obj.custom_alias)])
+    return len(objects)
+
+
+def import_links(stream, fmt, user_id, chunk_size=CHUNK_SIZE, start_after=0, limit=None, on_chunk=None, on_error=None):
+    """استيراد السجلات بعد الموضع start_after؛ on_error(position, message) لكل سجل مرفوض
+    و on_chunk(result) بعد كل دفعة مثبتة"""
+    result = ImportResult(start_after)
+    now = timezone.now()
+    chunk = []
+    chunk_errors = []
+
+    def flush():
+        created, save_errors = 0, []
+        for _ in range(CHUNK_ATTEMPTS):
+            save_errors = []
+            try:
+                created = _save_chunk(user_id, chunk, lambda *error: save_errors.append(error))
+                break
+            except IntegrityError:
+                # تعارض مع إنشاء متزامن بعد الفحص: إعادة الدفعة برموز وفحص جديدين
+                continue
+        else:
+            # استمر التعارض: سجلات الدفعة تُرفض ويكمل الاستيراد بالدفعة التالية
+            save_errors = [(position, 'conflicts with links created concurrently') for position, _ in chunk]
+        for error in sorted(chunk_errors + save_errors):
+            result.add_error(*error)
+            if on_error:
+                on_error(*error)
+        result.created += created
+        result.position = last_position
+        chunk.clear()
+        chunk_errors.clear()
+        if created:
+            dashboard.invalidate([user_id])
+        if on_chunk:
+            on_chunk(result)
+
+    last_position = start_after
+    seen_aliases = set()
+    for position, record in read_records(stream, fmt):
+        if position <= start_after:
+            continue
+        if limit is not None and position > start_after + limit:
+            result.done = False
+            break
+        last_position = position
+        try:
+            fields = clean(record, now)
+        except ValueError as exc:
+            chunk_errors.append((position, str(exc)))
+            fields = None
+        if fields and fields['custom_alias']:
+            if fields['custom_alias'] in seen_aliases:
+                chunk_errors.append((position, f'duplicate custom_alias "{fields["custom_alias"]}" in this chunk'))
+                fields = None
+            else:
+                seen_aliases.add(fields['custom_alias'])
+        if fields:
+            chunk.append((position, fields))
+        if position - result.position >= chunk_size:
+            flush()
+            seen_aliases.clear()
+    if last_position > result.position:
+        flush()
+    return result
@@ -0,0 +1,73 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+from shortener import metrics
+
+
+_current_stats = contextvars.ContextVar('shortener_request_stats', default=None)
+
+
+class RequestStats:
+    """عدادات الأداء لطلب واحد"""
+
+    __slots__ = ('started', 'db_queries', 'db_time', 'cache_hits', 'cache_misses', 'external')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.external = {}
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        """يُمرَّر إلى connection.execute_wrapper لقياس الاستعلامات"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.db_queries += 1
+
+
+def begin_request():
+    stats = RequestStats()
+    return stats, _current_stats.set(stats)
+
+
+def end_request(token):
+    _current_stats.reset(token)
+
+
+def current_stats():
+    return _current_stats.get()
+
+
+def record_cache(name, hit):
+    """تسجيل إصابة أو إخفاق في أحد الكاشات"""
+    metrics.CACHE_REQUESTS.inc(cache=name, result='hit' if hit else 'miss')
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    if hit:
+        stats.cache_hits += 1
+    else:
+        stats.cache_misses += 1
+
+
+@contextmanager
+def timed(name):
+    """قياس زمن عملية خارجية (جلب البيانات الوصفية، GeoIP...)"""
+    stats = _current_stats.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.EXTERNAL_LATENCY.observe(elapsed, name=name)
+        if stats is not None:
+            stats.external[name] = stats.external.get(name, 0.0) + elapsed
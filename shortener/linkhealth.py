@@ -0,0 +1,174 @@
+"""فحص روابط الوجهة بالتوازي عبر aiohttp.
+
+آلاف الطلبات المعلقة في حلقة واحدة، مع حد لكل مضيف (لا نثقل موقعاً واحداً)
+وحد عام لعدد الطلبات في الثانية. موعد الفحص التالي يتبع عدد النقرات:
+الروابط الأكثر استخداماً تُفحص أكثر، والمعطلة يُعاد فحصها أسرع.
+"""
+import asyncio
+import random
+import time
+from collections import defaultdict
+from datetime import timedelta
+from itertools import chain, zip_longest
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import URL, LinkHealth
+
+USER_AGENT = 'Mozilla/5.0 (compatible; UrlPro/1.0; link-check)'
+# خوادم كثيرة لا تدعم HEAD أو ترفضه؛ نعيد المحاولة بـ GET دون قراءة المحتوى
+FALLBACK_TO_GET = {403, 405, 501}
+
+
+def interval_for(click_count, failures=0):
+    """المدة حتى الفحص التالي حسب عدد النقرات وعدد مرات الفشل المتتالية"""
+    seconds = settings.LINK_HEALTH_INTERVALS[-1][1]
+    for min_clicks, interval in settings.LINK_HEALTH_INTERVALS:
+        if click_count >= min_clicks:
+            seconds = interval
+            break
+    if failures:
+        seconds = min(seconds, settings.LINK_HEALTH_RETRY * 2 ** (failures - 1))
+    # تشتيت بسيط حتى لا تتجمع الفحوص في الموعد نفسه
+    return timedelta(seconds=seconds * random.uniform(0.9, 1.1))
+
+
+def ensure_rows(batch_size=5000):
+    """إنشاء سجلات فحص للروابط النشطة التي لم تُفحص بعد؛ تصبح مستحقة فوراً"""
+    created = 0
+    missing = URL.objects.filter(is_active=True, health__isnull=True).order_by().values_list('id', flat=True)
+    while True:
+        ids = list(missing[:batch_size])
+        if not ids:
+            return created
+        LinkHealth.objects.bulk_create([LinkHealth(url_id=url_id) for url_id in ids], ignore_conflicts=True)
+        created += len(ids)
+
+
+def due(limit, now=None):
+    """الروابط المستحقة للفحص: (url_id, original_url, click_count, failures)"""
+    return list(
+        LinkHealth.objects.filter(next_check_at__lte=now or timezone.now(), url__is_active=True)
+        .order_by('next_check_at')
+        .values_list('url_id', 'url__original_url', 'url__click_count', 'failures')[:limit]
+    )
+
+
+def _host(url):
+    try:
+        return (urlsplit(url).hostname or '').lower()
+    except ValueError:
+        return ''
+
+
+def _interleave(targets):
+    # توزيع روابط المضيف الواحد على طول الطابور حتى لا ينتظر كل العمال المضيف نفسه
+    by_host = defaultdict(list)
+    for target in targets:
+        by_host[_host(target[1])].append(target)
+    return [target for target in chain.from_iterable(zip_longest(*by_host.values())) if target is not None]
+
+
+class RateLimiter:
+    """حد عام: طلب واحد كل 1/rate ثانية على الأكثر"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_at = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        delay = self.next_at - now
+        self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def check(targets, concurrency, per_host, rate, timeout):
+    """فحص [(url_id, url), ...]؛ يعيد [(url_id, status, error, latency_ms), ...]"""
+    import aiohttp
+
+    hosts = defaultdict(lambda: asyncio.Semaphore(per_host))
+    limiter = RateLimiter(rate)
+    queue = asyncio.Queue()
+    for target in _interleave(targets):
+        queue.put_nowait(target)
+    results = []
+
+    async def status_of(session, method, url):
+        async with session.request(method, url, allow_redirects=True, max_redirects=5) as response:
+            return response.status
+
+    async def check_one(session, url_id, url):
+        async with hosts[_host(url)]:
+            await limiter.wait()
+            started = time.monotonic()
+            status, error = None, ''
+            try:
+                status = await status_of(session, 'HEAD', url)
+                if status in FALLBACK_TO_GET:
+                    await limiter.wait()
+                    status = await status_of(session, 'GET', url)
+            except asyncio.TimeoutError:
+                error = 'timeout'
+            except (aiohttp.ClientError, ValueError) as exc:
+                error = f'{type(exc).__name__}: {exc}'[:200]
+            return url_id, status, error, (time.monotonic() - started) * 1000
+
+    async def worker(session):
+        while not queue.empty():
+            url_id, url = queue.get_nowait()
+            results.append(await check_one(session, url_id, url))
+
+    connector = aiohttp.TCPConnector(limit=concurrency, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=timeout),
+        headers={'User-Agent': USER_AGENT},
+    ) as session:
+        await asyncio.gather(*(worker(session) for _ in range(min(concurrency, queue.qsize()))))
+    return results
+
+
+def save(rows, results, now=None):
+    """حفظ النتائج وجدولة الفحص التالي؛ يعيد عدد الروابط المعطلة"""
+    now = now or timezone.now()
+    previous = {url_id: (click_count, failures) for url_id, _, click_count, failures in rows}
+    updates = []
+    for url_id, status, error, latency_ms in results:
+        click_count, failures = previous[url_id]
+        ok = status is not None and status < 400
+        failures = 0 if ok else failures + 1
+        updates.append(LinkHealth(
+            url_id=url_id, status_code=status, ok=ok, error=error, latency_ms=latency_ms,
+            failures=failures, checked_at=now, next_check_at=now + interval_for(click_count, failures),
+        ))
+    LinkHealth.objects.bulk_update(
+        updates, ['status_code', 'ok', 'error', 'latency_ms', 'failures', 'checked_at', 'next_check_at'],
+        batch_size=500,
+    )
+    return sum(1 for health in updates if health.is_broken)
+
+
+def run(limit, batch_size=5000, concurrency=None, per_host=None, rate=None, timeout=None):
+    """فحص حتى limit رابطاً مستحقاً على دفعات؛ يعيد (عدد المفحوصة، عدد المعطلة)"""
+    concurrency = concurrency or settings.LINK_HEALTH_CONCURRENCY
+    per_host = per_host or settings.LINK_HEALTH_PER_HOST
+    rate = settings.LINK_HEALTH_RATE if rate is None else rate
+    timeout = timeout or settings.LINK_HEALTH_TIMEOUT
+    ensure_rows()
+    checked = broken = 0
+    while checked < limit:
+        rows = due(min(batch_size, limit - checked))
+        if not rows:
+            break
+        results = asyncio.run(check(
+            [(url_id, url) for url_id, url, _, _ in rows], concurrency, per_host, rate, timeout
+        ))
+        broken += save(rows, results)
+        checked += len(rows)
+    return checked, broken
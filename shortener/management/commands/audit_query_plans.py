@@ -0,0 +1,180 @@
+import json
+import os
+import secrets
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from shortener import apikeys, dashboard, digest, domains, expiry, exports, linkhealth, reports, resolver, views
+from shortener.models import URL, APIKey, ClickAnalytics, Notification
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'query_plan_baseline.json')
+
+# ما عدا ذلك (INSERT و SAVEPOINT...) لا يُفحص
+EXPLAINED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+
+def sample_data():
+    """مستخدم ورابط ونقرة وإشعار تمر بها المسارات؛ تُلغى مع معاملة الفحص"""
+    user = User.objects.create(username=f'audit-{secrets.token_hex(4)}')
+    url = URL.objects.create(
+        user=user, original_url='https://example.com/', custom_alias=f'audit-{secrets.token_hex(4)}',
+        tags='audit', expires_at=timezone.now() + timedelta(days=1),
+    )
+    ClickAnalytics.objects.create(url=url, user=user, ip_address='10.0.0.1', user_agent='audit')
+    Notification.objects.create(user=user, title='audit', message='audit')
+    raw_key, _ = APIKey.issue(user, 'audit')
+    return user, url, raw_key
+
+
+def refresh_domains():
+    # فحص البصمة وإعادة التحميل يمسحان جدول النطاقات الصغير، مرة كل DOMAIN_MAP_REFRESH ثانية
+    with override_settings(DOMAIN_MAP_REFRESH=0):
+        domains.prime()
+
+
+def hot_paths(user, url, raw_key):
+    """المسارات الساخنة: كل مسار يستدعي الدوال والعروض نفسها التي يستدعيها الإنتاج"""
+    factory = RequestFactory()
+
+    def request(path='/', user=user):
+        request = factory.get(path, HTTP_HOST=domains.name_for(url.domain_id))
+        request.user = user
+        return request
+
+    period = reports.current_period()
+    code = url.custom_alias
+    return {
+        'domains.refresh': refresh_domains,
+        'home.index': lambda: views.index(request(user=AnonymousUser())),
+        'redirect.resolve': lambda: resolver.load_entry(code, url.domain_id),
+        'expiry.due_batch': lambda: expiry.expire_due_urls(),
+        'expiry.next': expiry.next_expiry,
+        'dashboard.compute': lambda: dashboard.compute(user.pk),
+        'dashboard.notifications': lambda: list(dashboard.unread_notifications(user.pk)),
+        'analytics.page': lambda: views.url_analytics(request(), code),
+        'api.links_page': lambda: views.api_links(request()),
+        'api.clicks_page': lambda: views.api_link_clicks(request(), code),
+        'tags.cloud': lambda: views.tag_cloud(request()),
+        'tags.links': lambda: views.tag_links(request(), 'audit'),
+        'export.user': lambda: list(exports.iter_clicks(exports.clicks_for(user=user))),
+        'export.url': lambda: list(exports.iter_clicks(exports.clicks_for(url=url))),
+        'export.all': lambda: list(exports.iter_clicks(exports.clicks_for())),
+        'digest.weekly_stats': lambda: (digest.weekly_stats(), digest.weekly_stats([user.pk])),
+        'reports.fingerprint': lambda: reports.report_fingerprint(user, period),
+        'reports.data': lambda: reports.build_report_data(user, period),
+        # مرتان: التحميل الأول ثم الإصابة في الكاش، ولا يجب أن تصدر عنها استعلامات
+        'apikey.authenticate': lambda: (apikeys.authenticate(raw_key), apikeys.authenticate(raw_key)),
+        'linkhealth.due': lambda: linkhealth.due(100),
+    }
+
+
+def explain(connection, sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}')
+        return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+
+def findings_for(plan):
+    """استخراج المسح الكامل وجداول B-tree المؤقتة من EXPLAIN QUERY PLAN"""
+    findings = []
+    for line in plan.splitlines():
+        detail = line.split(' ', 3)[-1] if line[:1].isdigit() else line.strip()
+        if detail.startswith('SCAN ') and 'USING INTEGER PRIMARY KEY' not in detail:
+            findings.append(detail)
+        elif 'USE TEMP B-TREE' in detail:
+            findings.append(detail)
+    return sorted(set(findings))
+
+
+class Command(BaseCommand):
+    help = ('Run the hot production paths in a rolled-back transaction, EXPLAIN every query they issue, '
+            'and fail on full scans or temp B-trees not in the baseline.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--baseline', default=BASELINE_PATH)
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Accept the current findings as the new baseline.')
+        parser.add_argument('--use-existing', action='store_true',
+                            help='Explain against the configured databases instead of fresh test databases.')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan.')
+
+    def handle(self, *args, **options):
+        created = []
+        if not options['use_existing']:
+            # قواعد بيانات اختبار مؤقتة بالمخطط الحالي بعد الترحيلات
+            for alias in connections:
+                connection = connections[alias]
+                created.append((connection, connection.settings_dict['NAME']))
+                connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            report = self.audit(options['verbose_plans'])
+        finally:
+            for connection, old_name in created:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if options['update_baseline']:
+            with open(options['baseline'], 'w') as fh:
+                json.dump(report, fh, indent=2, sort_keys=True)
+                fh.write('\n')
+            self.stdout.write(f"Baseline written to {options['baseline']}")
+            return
+
+        baseline = {}
+        if os.path.exists(options['baseline']):
+            with open(options['baseline']) as fh:
+                baseline = json.load(fh)
+
+        new_findings = {
+            name: [finding for finding in findings if finding not in baseline.get(name, [])]
+            for name, findings in report.items()
+        }
+        new_findings = {name: findings for name, findings in new_findings.items() if findings}
+        for name, findings in sorted(report.items()):
+            status = 'NEW' if name in new_findings else ('known' if findings else 'ok')
+            self.stdout.write(f'{status:>5}  {name}')
+            for finding in findings:
+                self.stdout.write(f'         {finding}')
+        if new_findings:
+            raise CommandError(
+                f'{len(new_findings)} queries have new full scans or temp B-trees: '
+                + ', '.join(sorted(new_findings))
+            )
+
+    def audit(self, verbose):
+        report = {}
+        # كل ما يكتبه الفحص (البيانات التجريبية وآثار المسارات) يُلغى في النهاية، حتى مع --use-existing
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(transaction.atomic(using=alias))
+            # تحديث جدول النطاقات يُفحص في domains.refresh وحده، لا في أي مسار يصادف موعده
+            stack.enter_context(override_settings(DOMAIN_MAP_REFRESH=float('inf')))
+            paths = hot_paths(*sample_data())
+            for name, run in paths.items():
+                with ExitStack() as capture:
+                    captured = [
+                        (connections[alias], capture.enter_context(CaptureQueriesContext(connections[alias])))
+                        for alias in connections
+                    ]
+                    run()
+                findings = set()
+                for connection, queries in captured:
+                    for query in queries:
+                        sql = query['sql']
+                        if not sql.lstrip().upper().startswith(EXPLAINED_STATEMENTS):
+                            continue
+                        plan = explain(connection, sql)
+                        if verbose:
+                            self.stdout.write(f'-- {name}: {sql}\n{plan}')
+                        findings.update(findings_for(plan))
+                report[name] = sorted(findings)
+            for alias in connections:
+                transaction.set_rollback(True, using=alias)
+        return report
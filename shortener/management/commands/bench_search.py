@@ -0,0 +1,97 @@
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from shortener.search import FTS_COLUMNS, FTS_WEIGHTS, build_match, fts_schema
+
+
+WORDS = [
+    'sale', 'summer', 'winter', 'news', 'blog', 'shop', 'video', 'course', 'python', 'django',
+    'offer', 'launch', 'event', 'report', 'guide', 'travel', 'music', 'sport', 'health', 'finance',
+    'عرض', 'تخفيضات', 'أخبار', 'مدونة', 'متجر', 'دورة', 'رحلة', 'تقرير', 'دليل', 'رياضة',
+]
+
+
+def _text(rng, count):
+    return ' '.join(rng.choice(WORDS) + str(rng.randint(0, 999)) for _ in range(count))
+
+
+class Command(BaseCommand):
+    help = 'Benchmark FTS5 ranked search against LIKE scans on a synthetic links table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--batch-size', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'search.sqlite3')
+            conn = sqlite3.connect(path)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE url (id INTEGER PRIMARY KEY, user_id INTEGER, '
+                + ', '.join(f'{column} TEXT' for column in FTS_COLUMNS) + ')'
+            )
+            for statement in fts_schema(table='url', fts_table='url_fts'):
+                conn.execute(statement)
+
+            started = time.monotonic()
+            insert = (
+                f"INSERT INTO url (user_id, {', '.join(FTS_COLUMNS)}) "
+                f"VALUES (?{', ?' * len(FTS_COLUMNS)})"
+            )
+            for offset in range(0, options['rows'], options['batch_size']):
+                count = min(options['batch_size'], options['rows'] - offset)
+                conn.executemany(insert, (
+                    (
+                        rng.randint(1, 1000), _text(rng, 4), _text(rng, 12),
+                        f'https://example.com/{rng.choice(WORDS)}/{rng.randint(0, 10 ** 6)}',
+                        ','.join(rng.choice(WORDS) for _ in range(3)), _text(rng, 5), _text(rng, 10),
+                    )
+                    for _ in range(count)
+                ))
+                conn.commit()
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"Inserted {options['rows']} rows with FTS triggers in {elapsed:.1f}s "
+                f"({options['rows'] / elapsed:.0f} rows/s), {os.path.getsize(path) / 2 ** 20:.0f} MiB"
+            )
+
+            terms = [rng.choice(WORDS) + str(rng.randint(0, 999)) for _ in range(options['queries'])]
+            weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+            like_where = ' OR '.join(f'{column} LIKE ?' for column in FTS_COLUMNS)
+            self.report('LIKE scan', [
+                self.timed(conn, f'SELECT id FROM url WHERE {like_where} LIMIT 20',
+                           [f'%{term}%'] * len(FTS_COLUMNS))
+                for term in terms[:max(1, options['queries'] // 10)]
+            ])
+            self.report('FTS5 bm25', [
+                self.timed(conn, 'SELECT rowid FROM url_fts WHERE url_fts MATCH ? '
+                                 f'ORDER BY bm25(url_fts, {weights}) LIMIT 20',
+                           [build_match(term)])
+                for term in terms
+            ])
+            self.report('FTS5 bm25 per user', [
+                self.timed(conn, 'SELECT url_fts.rowid FROM url_fts JOIN url u ON u.id = url_fts.rowid '
+                                 f'WHERE url_fts MATCH ? AND u.user_id = ? ORDER BY bm25(url_fts, {weights}) LIMIT 20',
+                           [build_match(term), rng.randint(1, 1000)])
+                for term in terms
+            ])
+            conn.close()
+
+    def timed(self, conn, sql, params):
+        started = time.monotonic()
+        conn.execute(sql, params).fetchall()
+        return time.monotonic() - started
+
+    def report(self, name, timings):
+        timings.sort()
+        p50 = timings[len(timings) // 2] * 1000
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000
+        self.stdout.write(f'  {name:<20} {len(timings):>4} queries  p50 {p50:8.2f}ms  p95 {p95:8.2f}ms')
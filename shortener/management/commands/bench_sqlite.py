@@ -0,0 +1,155 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import string
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from shortener.db import apply_pragmas
+
+
+PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -65536,
+    'temp_store': 'MEMORY',
+}
+
+SCHEMA = [
+    'CREATE TABLE url (id INTEGER PRIMARY KEY, short_code TEXT UNIQUE, original_url TEXT,'
+    ' click_count INTEGER NOT NULL DEFAULT 0)',
+    'CREATE TABLE click (id INTEGER PRIMARY KEY, url_id INTEGER, ip_address TEXT, clicked_at REAL)',
+    'CREATE INDEX click_url_idx ON click (url_id, clicked_at)',
+]
+
+
+def _connect(path, pragmas):
+    conn = sqlite3.connect(path, timeout=5)
+    if pragmas:
+        apply_pragmas(conn.cursor(), pragmas)
+    return conn
+
+
+def _worker(path, role, pragmas, persistent, codes, duration, results):
+    """عملية تحاكي عامل gunicorn: إعادة توجيه أو تسجيل/قراءة نقرات"""
+    rng = random.Random(os.getpid())
+    conn = _connect(path, pragmas) if persistent else None
+    ops = errors = 0
+    latencies = []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        db = conn or _connect(path, pragmas)
+        code = rng.choice(codes)
+        try:
+            if role == 'redirect':
+                row = db.execute('SELECT id, original_url FROM url WHERE short_code = ?', (code,)).fetchone()
+                db.execute('UPDATE url SET click_count = click_count + 1 WHERE id = ?', (row[0],))
+                db.commit()
+            elif role == 'ingest':
+                db.execute(
+                    'INSERT INTO click (url_id, ip_address, clicked_at) VALUES (?, ?, ?)',
+                    (rng.randint(1, len(codes)), '10.0.0.1', time.time()),
+                )
+                db.commit()
+            else:
+                db.execute(
+                    'SELECT count(*) FROM click WHERE url_id = ? AND clicked_at > ?',
+                    (rng.randint(1, len(codes)), time.time() - 3600),
+                ).fetchone()
+            ops += 1
+            latencies.append(time.monotonic() - started)
+        except sqlite3.OperationalError:
+            errors += 1
+            db.rollback()
+        finally:
+            if conn is None:
+                db.close()
+    results.put((role, ops, errors, latencies))
+
+
+class Command(BaseCommand):
+    help = 'Compare SQLite throughput under mixed redirect and analytics load for the development and production profiles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per profile.')
+        parser.add_argument('--redirect-workers', type=int, default=4)
+        parser.add_argument('--ingest-workers', type=int, default=2)
+        parser.add_argument('--analytics-workers', type=int, default=2)
+        parser.add_argument('--links', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        pragmas = settings.SQLITE_PRAGMAS or PRODUCTION_PRAGMAS
+        profiles = [
+            ('development', {}, False),
+            ('production', pragmas, True),
+        ]
+        self.stdout.write(
+            f"{options['redirect_workers']} redirect, {options['ingest_workers']} ingest and "
+            f"{options['analytics_workers']} analytics processes, {options['duration']:.0f}s per profile"
+        )
+        for name, profile_pragmas, persistent in profiles:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                codes = self.seed(path, options['links'])
+                self.report(name, self.run(path, profile_pragmas, persistent, codes, options), options['duration'])
+
+    def seed(self, path, count):
+        conn = sqlite3.connect(path)
+        for statement in SCHEMA:
+            conn.execute(statement)
+        codes = [''.join(random.choices(string.ascii_letters, k=8)) for _ in range(count)]
+        conn.executemany(
+            'INSERT OR IGNORE INTO url (short_code, original_url) VALUES (?, ?)',
+            ((code, f'https://example.com/{code}') for code in codes),
+        )
+        conn.commit()
+        conn.close()
+        return codes
+
+    def run(self, path, pragmas, persistent, codes, options):
+        if pragmas.get('journal_mode'):
+            # وضع WAL دائم على مستوى الملف؛ نضبطه قبل بدء العمليات
+            _connect(path, {'journal_mode': pragmas['journal_mode']}).close()
+        results = multiprocessing.Queue()
+        roles = (
+            ['redirect'] * options['redirect_workers']
+            + ['ingest'] * options['ingest_workers']
+            + ['analytics'] * options['analytics_workers']
+        )
+        processes = [
+            multiprocessing.Process(
+                target=_worker,
+                args=(path, role, pragmas, persistent, codes, options['duration'], results),
+            )
+            for role in roles
+        ]
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        return collected
+
+    def report(self, name, collected, duration):
+        self.stdout.write(f'\n[{name}]')
+        by_role = {}
+        for role, ops, errors, latencies in collected:
+            totals = by_role.setdefault(role, [0, 0, []])
+            totals[0] += ops
+            totals[1] += errors
+            totals[2].extend(latencies)
+        for role, (ops, errors, latencies) in sorted(by_role.items()):
+            latencies.sort()
+            p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+            p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+            self.stdout.write(
+                f'  {role:<10} {ops / duration:>9.0f} ops/s  {errors:>5} lock errors'
+                f'  p50 {p50:.2f}ms  p99 {p99:.2f}ms'
+            )
@@ -0,0 +1,71 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# مكتبات ثقيلة يجب ألا تُحمَّل عند إقلاع العامل
+HEAVY_MODULES = ['reportlab', 'bs4', 'requests', 'geoip2', 'qrcode', 'PIL', 'user_agents', 'aiohttp']
+
+# يُنفَّذ في عملية جديدة: ما يحمّله عامل gunicorn قبل أول طلب
+PROBE = '''
+import json, os, resource, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.conf import settings
+from django.urls import get_resolver
+from urlshortener.wsgi import application
+get_resolver(settings.ROOT_URLCONF).url_patterns
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    'import_ms': elapsed * 1000,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy': [name for name in %r if name in sys.modules],
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Measure worker startup import time and resident memory, failing when they exceed the budget.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--max-import-ms', type=float, default=settings.STARTUP_IMPORT_BUDGET_MS)
+        parser.add_argument('--max-rss-mb', type=float, default=settings.STARTUP_RSS_BUDGET_MB)
+        parser.add_argument('--allow-heavy', action='store_true',
+                            help='Do not fail when heavy optional modules are imported at startup.')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'urlshortener.settings'))
+        samples = []
+        for _ in range(options['runs']):
+            result = subprocess.run(
+                [sys.executable, '-c', PROBE % (HEAVY_MODULES,)],
+                capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+            )
+            if result.returncode:
+                raise CommandError(f'Startup probe failed:\n{result.stderr}')
+            samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+        import_ms = statistics.median(sample['import_ms'] for sample in samples)
+        rss_mb = statistics.median(sample['rss_mb'] for sample in samples)
+        heavy = sorted({name for sample in samples for name in sample['heavy']})
+        self.stdout.write(
+            f"startup import {import_ms:.0f}ms (budget {options['max_import_ms']:.0f}ms), "
+            f"rss {rss_mb:.1f}MB (budget {options['max_rss_mb']:.0f}MB), median of {len(samples)} runs"
+        )
+
+        failures = []
+        if import_ms > options['max_import_ms']:
+            failures.append(f'import time {import_ms:.0f}ms over budget')
+        if rss_mb > options['max_rss_mb']:
+            failures.append(f'resident memory {rss_mb:.1f}MB over budget')
+        if heavy and not options['allow_heavy']:
+            failures.append(f"heavy modules imported at startup: {', '.join(heavy)}")
+        if failures:
+            raise CommandError('; '.join(failures))
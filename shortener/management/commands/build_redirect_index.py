@@ -0,0 +1,31 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shortener import redirect_index
+
+
+class Command(BaseCommand):
+    help = 'Build the memory-mapped redirect index shared by all workers; with --loop, rebuild periodically.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.REDIRECT_INDEX_PATH)
+        parser.add_argument('--loop', action='store_true', help='Rebuild continuously.')
+        parser.add_argument('--interval', type=float, default=300.0, help='Seconds between rebuilds in --loop mode.')
+
+    def handle(self, *args, **options):
+        path = options['output']
+        if not path:
+            raise CommandError('Set REDIRECT_INDEX_PATH or pass --output.')
+        while True:
+            started = time.monotonic()
+            count = redirect_index.build(path)
+            self.stdout.write(
+                f'Indexed {count} codes into {path} ({os.path.getsize(path) / 2 ** 20:.1f} MiB) '
+                f'in {time.monotonic() - started:.2f}s'
+            )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
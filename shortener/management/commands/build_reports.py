@@ -0,0 +1,32 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from shortener.reports import build_report, current_period, period_bounds
+
+
+class Command(BaseCommand):
+    help = 'Pre-render monthly PDF reports so downloads are served from the cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', default=None, help='Month as YYYY-MM (default: current month).')
+        parser.add_argument('--user', action='append', dest='users', help='Only build for these usernames.')
+
+    def handle(self, *args, **options):
+        period = options['period'] or current_period()
+        try:
+            period_bounds(period)
+        except ValueError:
+            raise CommandError(f'Invalid period {period}, expected YYYY-MM.')
+
+        users = User.objects.filter(url__isnull=False).distinct().order_by('pk')
+        if options['users']:
+            users = users.filter(username__in=options['users'])
+
+        started = time.monotonic()
+        built = 0
+        for user in users.iterator():
+            build_report(user, period)
+            built += 1
+        self.stdout.write(f'{built} reports for {period} ready in {time.monotonic() - started:.1f}s')
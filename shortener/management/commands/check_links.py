@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from shortener import linkhealth
+
+
+class Command(BaseCommand):
+    help = 'Check destination URLs that are due for a health check; with --loop, keep checking.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=50000, help='Maximum links checked per run.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--concurrency', type=int, default=settings.LINK_HEALTH_CONCURRENCY,
+                            help='Requests in flight at once.')
+        parser.add_argument('--per-host', type=int, default=settings.LINK_HEALTH_PER_HOST,
+                            help='Requests in flight per destination host.')
+        parser.add_argument('--rate', type=float, default=settings.LINK_HEALTH_RATE,
+                            help='Maximum requests per second overall (0 for no limit).')
+        parser.add_argument('--timeout', type=float, default=settings.LINK_HEALTH_TIMEOUT)
+        parser.add_argument('--loop', action='store_true', help='Check continuously.')
+        parser.add_argument('--interval', type=float, default=60.0, help='Seconds between runs in --loop mode.')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            checked, broken = linkhealth.run(
+                options['limit'], options['batch_size'], options['concurrency'],
+                options['per_host'], options['rate'], options['timeout'],
+            )
+            self.stdout.write(f'Checked {checked} links in {time.monotonic() - started:.1f}s, {broken} broken')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
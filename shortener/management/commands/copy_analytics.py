@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Max
+
+from shortener.models import ClickAnalytics
+from shortener.routers import ANALYTICS_DB, analytics_enabled
+
+
+class Command(BaseCommand):
+    help = 'Copy existing click analytics from the default database into the analytics database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--source', default='default', help='Database alias to copy from.')
+
+    def handle(self, *args, **options):
+        if not analytics_enabled():
+            raise CommandError('No analytics database configured; set ANALYTICS_DB_PATH first.')
+        source = options['source']
+        if 'shortener_clickanalytics' not in connections[source].introspection.table_names():
+            raise CommandError(f'No click analytics table in the {source} database.')
+
+        # الاستئناف من آخر معرف منسوخ
+        last_id = ClickAnalytics.objects.using(ANALYTICS_DB).aggregate(last=Max('id'))['last'] or 0
+        fields = [field.attname for field in ClickAnalytics._meta.concrete_fields]
+
+        copied = 0
+        started = time.monotonic()
+        while True:
+            rows = list(
+                ClickAnalytics.objects.using(source)
+                .filter(id__gt=last_id).order_by('id').values(*fields)[:options['batch_size']]
+            )
+            if not rows:
+                break
+            with transaction.atomic(using=ANALYTICS_DB):
+                ClickAnalytics.objects.using(ANALYTICS_DB).bulk_create(
+                    [ClickAnalytics(**row) for row in rows]
+                )
+            last_id = rows[-1]['id']
+            copied += len(rows)
+            self.stdout.write(f'Copied {copied} clicks (last id {last_id})')
+
+        self.stdout.write(f'Done: {copied} clicks in {time.monotonic() - started:.1f}s')
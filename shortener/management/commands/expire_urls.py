@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from shortener.expiry import expire_due_urls, next_expiry
+
+
+class Command(BaseCommand):
+    help = 'Deactivate expired links in batches; with --loop, keep running as a scheduler.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--no-notify', action='store_true', help='Do not create user notifications.')
+        parser.add_argument('--loop', action='store_true', help='Run continuously.')
+        parser.add_argument('--interval', type=float, default=60.0,
+                            help='Maximum seconds between runs in --loop mode.')
+
+    def handle(self, *args, **options):
+        while True:
+            count = expire_due_urls(batch_size=options['batch_size'], notify=not options['no_notify'])
+            if count or not options['loop']:
+                self.stdout.write(f'Deactivated {count} expired links')
+            if not options['loop']:
+                return
+
+            # النوم حتى أقرب انتهاء قادم أو حتى انقضاء الفاصل الزمني
+            delay = options['interval']
+            upcoming = next_expiry()
+            if upcoming is not None:
+                delay = max(0.0, min(delay, (upcoming - timezone.now()).total_seconds()))
+            time.sleep(delay)
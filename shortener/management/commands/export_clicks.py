@@ -0,0 +1,79 @@
+import os
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from shortener.exports import InvalidCursor, click_export_stream, clicks_for, decode_cursor, parse_bound
+from shortener.models import URL
+
+
+def next_part(path):
+    """أول مسار غير موجود بالصيغة name.partN.ext بجانب path"""
+    directory, name = os.path.split(path)
+    stem, dot, ext = name.partition('.')
+    n = 1
+    while os.path.exists(os.path.join(directory, f'{stem}.part{n}{dot}{ext}')):
+        n += 1
+    return os.path.join(directory, f'{stem}.part{n}{dot}{ext}')
+
+
+class Command(BaseCommand):
+    help = 'Stream raw click data as NDJSON or CSV for a link, a user or everything.'
+
+    def add_arguments(self, parser):
+        scope = parser.add_mutually_exclusive_group()
+        scope.add_argument('--url', help='Short code or custom alias of a single link.')
+        scope.add_argument('--user', help='Username whose links should be exported.')
+        parser.add_argument('--start', help='Start date or datetime (inclusive).')
+        parser.add_argument('--end', help='End date or datetime (inclusive).')
+        parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip.')
+        parser.add_argument('--cursor', help='Resume after the row carrying this cursor.')
+        parser.add_argument('--output', '-o', help=(
+            'Output file (default: stdout). With --cursor an existing file is left untouched and the '
+            'rest is written to the next free NAME.partN.EXT next to it.'
+        ))
+
+    def handle(self, *args, **options):
+        if options['url']:
+            code = options['url']
+            url_obj = URL.objects.filter(Q(short_code=code) | Q(custom_alias=code)).first()
+            if url_obj is None:
+                raise CommandError(f'No link with code {code}.')
+            queryset = clicks_for(url=url_obj)
+        elif options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user named {options['user']}.")
+            queryset = clicks_for(user=user)
+        else:
+            queryset = clicks_for()
+
+        try:
+            start = parse_bound(options['start'])
+            end = parse_bound(options['end'], end=True)
+            if options['cursor']:
+                decode_cursor(options['cursor'])
+        except (ValueError, InvalidCursor) as exc:
+            raise CommandError(f'Invalid date range or cursor: {exc}')
+
+        stream = click_export_stream(
+            queryset, fmt=options['format'], start=start, end=end,
+            cursor=options['cursor'], compress=options['gzip'],
+        )
+
+        output = options['output']
+        if output and options['cursor'] and os.path.exists(output):
+            # الإضافة إلى ملف منقطع تلصق السجلات بسطر ناقص أو بعضو gzip غير مكتمل؛
+            # الجزء الجديد يبدأ بعد آخر سطر مكتمل (المؤشر) ويبقى صالحاً وحده
+            output = next_part(output)
+            self.stderr.write(f'Resuming into {output}')
+        out = open(output, 'xb' if options['cursor'] else 'wb') if output else sys.stdout.buffer
+        try:
+            for chunk in stream:
+                out.write(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8'))
+        finally:
+            if output:
+                out.close()
@@ -0,0 +1,75 @@
+import shlex
+import subprocess
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from django.utils import timezone
+
+from shortener import redirect_map
+from shortener.models import URL, RedirectChange
+
+
+class Command(BaseCommand):
+    help = 'Compile untracked, public, non-expiring links into per-domain nginx map includes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.REDIRECT_MAP_DIR)
+        parser.add_argument('--full', action='store_true', help='Rebuild every map instead of applying the change log.')
+        parser.add_argument('--expiry-margin', type=int, default=3600,
+                            help='Leave out links expiring within this many seconds.')
+        parser.add_argument('--reload-command', default=settings.REDIRECT_MAP_RELOAD_COMMAND,
+                            help='Run only when a map file changed, e.g. "nginx -s reload".')
+        parser.add_argument('--prune-days', type=int, default=7,
+                            help='Delete processed change log rows older than this.')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        directory = options['output']
+        margin = options['expiry_margin']
+        now = timezone.now()
+        state = redirect_map.read_state(directory)
+        last_change = RedirectChange.objects.aggregate(last=Max('id'))['last'] or 0
+
+        if options['full'] or 'last_change_id' not in state:
+            maps = redirect_map.build_full(now, margin)
+            mode = 'full'
+        else:
+            changed_ids = set(
+                RedirectChange.objects.filter(id__gt=state['last_change_id'], id__lte=last_change)
+                .values_list('url_id', flat=True)
+            )
+            # روابط دخلت هامش الانتهاء منذ آخر تشغيل دون أن يتغير سجلها
+            previous_horizon = datetime.fromisoformat(state['horizon'])
+            changed_ids.update(URL.objects.filter(
+                is_active=True,
+                expires_at__gt=previous_horizon,
+                expires_at__lte=now + timedelta(seconds=margin),
+            ).values_list('id', flat=True))
+            maps = redirect_map.apply_changes(redirect_map.RedirectMaps.load(directory), changed_ids, now, margin)
+            mode = f'incremental ({len(changed_ids)} links)'
+
+        state.update({
+            'last_change_id': last_change,
+            'horizon': (now + timedelta(seconds=margin)).isoformat(),
+            'generated_at': now.isoformat(),
+        })
+        changed = redirect_map.write(maps, directory, state)
+        entries = sum(len(urls) for urls in maps.files.values())
+        self.stdout.write(
+            f'{mode}: {entries} links in {len(maps.files)} files, {len(changed)} changed '
+            f'in {time.monotonic() - started:.2f}s'
+        )
+
+        if changed and options['reload_command']:
+            result = subprocess.run(shlex.split(options['reload_command']))
+            if result.returncode:
+                raise CommandError(f"Reload command failed with exit code {result.returncode}")
+            self.stdout.write('Proxy reloaded')
+
+        # آخر سجل يبقى دائماً: به يعرف redirect_index أن السجلات حُذفت بعد بناء فهرسه
+        RedirectChange.objects.filter(
+            id__lt=last_change, changed_at__lt=now - timedelta(days=options['prune_days'])
+        ).delete()
@@ -0,0 +1,83 @@
+import csv
+import json
+import os
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from shortener import importer
+
+
+class Command(BaseCommand):
+    help = 'Bulk import links from a CSV or NDJSON file, resumable from a checkpoint file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True, help='Username that owns the imported links.')
+        parser.add_argument('--format', choices=importer.FORMATS, help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=importer.CHUNK_SIZE)
+        parser.add_argument('--checkpoint', help='Defaults to <path>.checkpoint.json.')
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint.')
+        parser.add_argument('--errors', help='Write every rejected record to this CSV file.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+        fmt = options['format'] or importer.detect_format(path)
+        checkpoint_path = options['checkpoint'] or f'{path}.checkpoint.json'
+
+        checkpoint = {}
+        if not options['restart'] and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as fh:
+                checkpoint = json.load(fh)
+            if checkpoint.get('path') != os.path.abspath(path) or checkpoint.get('user') != user.username:
+                raise CommandError(f'{checkpoint_path} belongs to another import; pass --restart or --checkpoint.')
+            self.stdout.write(f"Resuming after record {checkpoint['position']}")
+        start_after = checkpoint.get('position', 0)
+
+        errors_file = open(options['errors'], 'a' if start_after else 'w', newline='') if options['errors'] else None
+        errors_writer = csv.writer(errors_file) if errors_file else None
+        if errors_writer and not start_after:
+            errors_writer.writerow(['position', 'error'])
+        started = time.monotonic()
+
+        def on_error(position, message):
+            errors_writer.writerow([position, message])
+
+        def on_chunk(result):
+            if errors_file:
+                errors_file.flush()
+            tmp_path = f'{checkpoint_path}.tmp'
+            with open(tmp_path, 'w') as fh:
+                json.dump({
+                    'path': os.path.abspath(path), 'user': user.username,
+                    'position': result.position,
+                    'created': checkpoint.get('created', 0) + result.created,
+                    'errors': checkpoint.get('errors', 0) + result.error_count,
+                }, fh)
+            os.replace(tmp_path, checkpoint_path)
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'record {result.position}: {result.created} created, {result.error_count} rejected, '
+                f'{(result.position - start_after) / max(elapsed, 1e-9):.0f} records/s'
+            )
+
+        try:
+            with open(path, 'rb') as stream:
+                result = importer.import_links(
+                    stream, fmt, user.pk, options['chunk_size'], start_after,
+                    on_chunk=on_chunk, on_error=on_error if errors_writer else None,
+                )
+        finally:
+            if errors_file:
+                errors_file.close()
+        for position, message in result.errors[:20]:
+            self.stderr.write(f'record {position}: {message}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.created} links in {time.monotonic() - started:.1f}s, '
+            f'{result.error_count} records rejected'
+        ))
@@ -0,0 +1,43 @@
+import io
+import os
+import pstats
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Merge sampled profiler dumps and print the top functions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', help='Only include dumps for this URL name.')
+        parser.add_argument('--dir', default=None, help='Profile directory (default: PROFILE_DIR).')
+        parser.add_argument('--sort', default='cumulative',
+                            choices=['cumulative', 'tottime', 'ncalls'],
+                            help='Sort key for the summary.')
+        parser.add_argument('--limit', type=int, default=25, help='Number of functions to show.')
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or settings.PROFILE_DIR
+        if not os.path.isdir(directory):
+            raise CommandError(f'Profile directory {directory} does not exist.')
+
+        prefix = f"{options['view']}-" if options['view'] else ''
+        paths = sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.endswith('.prof') and name.startswith(prefix)
+        )
+        if not paths:
+            raise CommandError('No profile dumps found.')
+
+        output = io.StringIO()
+        stats = pstats.Stats(paths[0], stream=output)
+        for path in paths[1:]:
+            try:
+                stats.add(path)
+            except (OSError, TypeError, EOFError):
+                self.stderr.write(f'Skipping unreadable dump {path}')
+
+        self.stdout.write(f'Merged {len(paths)} dumps from {directory}')
+        stats.strip_dirs().sort_stats(options['sort']).print_stats(options['limit'])
+        self.stdout.write(output.getvalue())
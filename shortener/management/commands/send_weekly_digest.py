@@ -0,0 +1,84 @@
+import os
+import time
+
+from django.contrib.auth.models import User
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand, CommandError
+
+from shortener.digest import build_weekly_message, weekly_stats
+
+
+class Command(BaseCommand):
+    help = 'Send the weekly digest to every opted-in user over one mail connection.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--checkpoint', default=None,
+                            help='File storing the last processed user id; resumes from it when present.')
+        parser.add_argument('--dry-run', action='store_true', help='Render messages without sending.')
+
+    def read_checkpoint(self, path):
+        if path and os.path.exists(path):
+            with open(path) as fh:
+                return int(fh.read().strip() or 0)
+        return 0
+
+    def write_checkpoint(self, path, last_id):
+        if not path:
+            return
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as fh:
+            fh.write(str(last_id))
+        os.replace(tmp_path, path)
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        batch_size = options['batch_size']
+        last_id = self.read_checkpoint(checkpoint)
+
+        recipients = User.objects.filter(
+            pk__gt=last_id, is_active=True, userprofile__weekly_reports=True,
+        ).exclude(email='').only('pk', 'username', 'email').order_by('pk')
+
+        # كل الإحصائيات في استعلامين قبل بدء الإرسال
+        weekly_clicks, active_links = weekly_stats()
+
+        started = time.monotonic()
+        sent = 0
+        connection = get_connection()
+        if not options['dry_run']:
+            connection.open()
+        try:
+            batch = []
+            for user in recipients.iterator(chunk_size=batch_size):
+                batch.append(build_weekly_message(user, weekly_clicks, active_links, connection=connection))
+                last_id = user.pk
+                if len(batch) >= batch_size:
+                    sent += self.send_batch(connection, batch, options['dry_run'], checkpoint)
+                    self.write_checkpoint(checkpoint, last_id)
+                    batch = []
+            if batch:
+                sent += self.send_batch(connection, batch, options['dry_run'], checkpoint)
+                self.write_checkpoint(checkpoint, last_id)
+        finally:
+            connection.close()
+
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+        elapsed = time.monotonic() - started
+        rate = sent / elapsed if elapsed else 0
+        self.stdout.write(f'Sent {sent} weekly digests in {elapsed:.1f}s ({rate:.0f}/s)')
+
+    def send_batch(self, connection, batch, dry_run, checkpoint):
+        """إرسال الدفعة كاملة أو الفشل دون تقديم نقطة الاستئناف؛ إعادة التشغيل تبدأ من هذه الدفعة"""
+        if dry_run:
+            return len(batch)
+        resume = f' Rerun to resume from {checkpoint}.' if checkpoint else ' Pass --checkpoint to resume.'
+        try:
+            sent = connection.send_messages(batch) or 0
+        except Exception as exc:
+            raise CommandError(f'Sending a batch of {len(batch)} digests failed: {exc}.{resume}') from exc
+        if sent != len(batch):
+            raise CommandError(f'Only {sent} of {len(batch)} digests in a batch were sent.{resume}')
+        return sent
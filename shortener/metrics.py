@@ -0,0 +1,246 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_registry = {}
+_last_flush = 0.0
+_suppressed = False
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        _registry[name] = self
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, '')) for label in self.labelnames)
+
+    def snapshot(self):
+        return [[list(key), value] for key, value in self.values.items()]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if _suppressed:
+            return
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        maybe_flush()
+
+    @staticmethod
+    def merge(current, value):
+        return (current or 0) + value
+
+
+class Gauge(Metric):
+    """مقياس لحظي؛ يُجمع بين العمليات الحية فقط"""
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        if _suppressed:
+            return
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = value
+        maybe_flush()
+
+    @staticmethod
+    def merge(current, value):
+        return (current or 0) + value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        if _suppressed:
+            return
+        key = self._key(labels)
+        with _lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['buckets'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+        maybe_flush()
+
+    @staticmethod
+    def merge(current, value):
+        if current is None:
+            return {'buckets': list(value['buckets']), 'sum': value['sum'], 'count': value['count']}
+        current['buckets'] = [a + b for a, b in zip(current['buckets'], value['buckets'])]
+        current['sum'] += value['sum']
+        current['count'] += value['count']
+        return current
+
+
+# المقاييس المعرفة في التطبيق
+REQUEST_LATENCY = Histogram(
+    'shortener_request_duration_seconds', 'Request latency by URL name.', ['view'])
+REQUEST_DB_TIME = Histogram(
+    'shortener_request_db_seconds', 'Time spent in database queries per request.', ['view'])
+REQUEST_DB_QUERIES = Counter(
+    'shortener_request_db_queries_total', 'Database queries issued, by URL name.', ['view'])
+CACHE_REQUESTS = Counter(
+    'shortener_cache_requests_total', 'Cache lookups by cache name and result.', ['cache', 'result'])
+EXTERNAL_LATENCY = Histogram(
+    'shortener_external_duration_seconds', 'External fetch latency (metadata, GeoIP).', ['name'])
+METADATA_FETCHES = Counter(
+    'shortener_metadata_fetch_total', 'Page metadata fetches by outcome.', ['outcome'])
+
+
+@contextmanager
+def suppressed():
+    """تجاهل كل القياسات داخل الكتلة (التسخين عند الإقلاع ليس حركة حقيقية)"""
+    global _suppressed
+    previous, _suppressed = _suppressed, True
+    try:
+        yield
+    finally:
+        _suppressed = previous
+
+
+def reset():
+    """تفريغ القيم الموروثة من العملية الأم بعد fork"""
+    global _last_flush
+    with _lock:
+        for metric in _registry.values():
+            metric.values = {}
+    _last_flush = 0.0
+
+
+def enabled():
+    return getattr(settings, 'METRICS_ENABLED', False)
+
+
+def _snapshot_path(pid):
+    return os.path.join(settings.METRICS_DIR, f'metrics-{pid}.json')
+
+
+def _snapshot():
+    with _lock:
+        return {name: metric.snapshot() for name, metric in _registry.items() if metric.values}
+
+
+def flush():
+    """كتابة قيم هذه العملية إلى ملفها في METRICS_DIR"""
+    global _last_flush
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if not directory:
+        return
+    _last_flush = time.monotonic()
+    os.makedirs(directory, exist_ok=True)
+    path = _snapshot_path(os.getpid())
+    tmp_path = f'{path}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as fh:
+        json.dump({'pid': os.getpid(), 'metrics': _snapshot()}, fh)
+    os.replace(tmp_path, path)
+
+
+def maybe_flush():
+    interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0)
+    if getattr(settings, 'METRICS_DIR', None) and time.monotonic() - _last_flush >= interval:
+        flush()
+
+
+def mark_process_dead(pid):
+    """يُستدعى من child_exit في gunicorn: تبقى العدادات وتُحذف المقاييس اللحظية"""
+    path = _snapshot_path(pid)
+    try:
+        with open(path) as fh:
+            data = json.load(fh)
+    except (OSError, ValueError):
+        return
+    data['metrics'] = {
+        name: samples for name, samples in data['metrics'].items()
+        if not isinstance(_registry.get(name), Gauge)
+    }
+    data['dead'] = True
+    with open(path, 'w') as fh:
+        json.dump(data, fh)
+
+
+def _load_snapshots():
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if not directory:
+        return [{'metrics': _snapshot()}]
+    flush()
+    snapshots = []
+    for filename in os.listdir(directory):
+        if not (filename.startswith('metrics-') and filename.endswith('.json')):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as fh:
+                snapshots.append(json.load(fh))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def aggregate():
+    merged = {name: {} for name in _registry}
+    for snapshot in _load_snapshots():
+        for name, samples in snapshot['metrics'].items():
+            metric = _registry.get(name)
+            if metric is None:
+                continue
+            for labels, value in samples:
+                key = tuple(labels)
+                merged[name][key] = metric.merge(merged[name].get(key), value)
+    return merged
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(metric, key, extra=()):
+    pairs = list(zip(metric.labelnames, key)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def render():
+    """تنسيق المقاييس بصيغة Prometheus النصية"""
+    lines = []
+    for name, samples in aggregate().items():
+        metric = _registry[name]
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        for key, value in sorted(samples.items()):
+            if metric.kind != 'histogram':
+                lines.append(f'{name}{_format_labels(metric, key)} {value}')
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets, value['buckets']):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(metric, key, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_bucket{_format_labels(metric, key, [("le", "+Inf")])} {value["count"]}')
+            lines.append(f'{name}_sum{_format_labels(metric, key)} {value["sum"]}')
+            lines.append(f'{name}_count{_format_labels(metric, key)} {value["count"]}')
+    return '\n'.join(lines) + '\n'
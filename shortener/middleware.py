@@ -0,0 +1,139 @@
+import cProfile
+import json
+import logging
+import os
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from shortener import instrumentation, metrics
+
+logger = logging.getLogger('shortener.perf')
+
+
+class PerformanceMiddleware:
+    """قياس الاستعلامات والكاش والطلبات الخارجية لكل طلب (اختياري)"""
+
+    def __init__(self, get_response):
+        self.emit_timing = getattr(settings, 'PERF_INSTRUMENTATION', False)
+        self.record_metrics = metrics.enabled()
+        if not (self.emit_timing or self.record_metrics):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.default_thresholds = getattr(settings, 'PERF_DEFAULT_THRESHOLDS', {})
+        self.view_thresholds = getattr(settings, 'PERF_VIEW_THRESHOLDS', {})
+
+    def __call__(self, request):
+        stats, token = instrumentation.begin_request()
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(stats.db_wrapper))
+                response = self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+
+        view_name = self.get_view_name(request)
+        total = stats.elapsed()
+        if self.record_metrics:
+            metrics.REQUEST_LATENCY.observe(total, view=view_name)
+            metrics.REQUEST_DB_TIME.observe(stats.db_time, view=view_name)
+            metrics.REQUEST_DB_QUERIES.inc(stats.db_queries, view=view_name)
+        if self.emit_timing:
+            response['Server-Timing'] = self.server_timing(stats, total)
+            self.log(request, response, view_name, stats, total)
+        return response
+
+    @staticmethod
+    def get_view_name(request):
+        match = getattr(request, 'resolver_match', None)
+        return match.url_name if match and match.url_name else 'unknown'
+
+    @staticmethod
+    def server_timing(stats, total):
+        parts = [
+            f'db;dur={stats.db_time * 1000:.1f};desc="{stats.db_queries} queries"',
+            f'cache;desc="hit={stats.cache_hits} miss={stats.cache_misses}"',
+        ]
+        for name, seconds in stats.external.items():
+            parts.append(f'{name};dur={seconds * 1000:.1f}')
+        parts.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(parts)
+
+    def log(self, request, response, view_name, stats, total):
+        record = {
+            'view': view_name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'db_queries': stats.db_queries,
+            'db_ms': round(stats.db_time * 1000, 1),
+            'cache_hits': stats.cache_hits,
+            'cache_misses': stats.cache_misses,
+        }
+        for name, seconds in stats.external.items():
+            record[f'{name}_ms'] = round(seconds * 1000, 1)
+
+        thresholds = {**self.default_thresholds, **self.view_thresholds.get(view_name, {})}
+        exceeded = [
+            key for key, limit in thresholds.items()
+            if key in record and record[key] > limit
+        ]
+        if exceeded:
+            record['exceeded'] = exceeded
+            logger.warning(json.dumps(record, ensure_ascii=False))
+        else:
+            logger.info(json.dumps(record, ensure_ascii=False))
+
+
+class SamplingProfilerMiddleware:
+    """تشغيل cProfile على نسبة صغيرة من الطلبات لكل اسم مسار"""
+
+    def __init__(self, get_response):
+        self.sample_rates = getattr(settings, 'PROFILE_SAMPLE_RATES', {})
+        if not self.sample_rates:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.directory = settings.PROFILE_DIR
+        self.max_files = getattr(settings, 'PROFILE_MAX_FILES', 200)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        profiler = getattr(request, '_profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            self.dump(profiler, request.resolver_match.url_name)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        url_name = request.resolver_match.url_name
+        rate = self.sample_rates.get(url_name)
+        if rate and random.random() < rate:
+            request._profiler = cProfile.Profile()
+            request._profiler.enable()
+
+    def dump(self, profiler, url_name):
+        filename = f'{url_name}-{time.time():.6f}-{os.getpid()}.prof'
+        profiler.dump_stats(os.path.join(self.directory, filename))
+        self.rotate()
+
+    def rotate(self):
+        """الإبقاء على أحدث PROFILE_MAX_FILES ملف فقط"""
+        paths = [
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory) if name.endswith('.prof')
+        ]
+        if len(paths) <= self.max_files:
+            return
+        paths.sort(key=os.path.getmtime)
+        for path in paths[:len(paths) - self.max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
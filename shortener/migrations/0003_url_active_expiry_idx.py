@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-19 07:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0002_urlcategory_url_custom_alias_url_description_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='url',
+            index=models.Index(fields=['is_active', 'expires_at'], name='url_active_expiry_idx'),
+        ),
+    ]
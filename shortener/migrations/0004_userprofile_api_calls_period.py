@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-19 07:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0003_url_active_expiry_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='api_calls_period',
+            field=models.CharField(blank=True, max_length=7),
+        ),
+    ]
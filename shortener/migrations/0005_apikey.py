@@ -0,0 +1,69 @@
+# Generated by Django 4.2 on 2026-10-19 07:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import hashlib
+import hmac
+import secrets
+
+
+def hash_existing_keys(apps, schema_editor):
+    """نقل المفاتيح النصية الحالية إلى APIKey بصيغة مجزأة دون تغييرها للمستخدمين"""
+    UserProfile = apps.get_model('shortener', 'UserProfile')
+    APIKey = apps.get_model('shortener', 'APIKey')
+    secret = getattr(settings, 'API_KEY_HASH_SECRET', settings.SECRET_KEY).encode()
+    APIKey.objects.bulk_create([
+        APIKey(
+            user_id=profile.user_id,
+            name='legacy',
+            prefix=profile.api_key[:8],
+            key_hash=hmac.new(secret, profile.api_key.encode(), hashlib.sha256).hexdigest(),
+        )
+        for profile in UserProfile.objects.exclude(api_key='').iterator()
+    ])
+
+
+def reissue_legacy_keys(apps, schema_editor):
+    """عند التراجع: المفاتيح محفوظة مجزأة ولا يمكن استعادتها، فيُصدر مفتاح جديد فريد لكل ملف"""
+    UserProfile = apps.get_model('shortener', 'UserProfile')
+    profiles = list(UserProfile.objects.only('pk'))
+    for profile in profiles:
+        profile.api_key = secrets.token_urlsafe(32)
+    UserProfile.objects.bulk_update(profiles, ['api_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('shortener', '0004_userprofile_api_calls_period'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='APIKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=100)),
+                ('prefix', models.CharField(db_index=True, max_length=8)),
+                ('key_hash', models.CharField(max_length=64, unique=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('revoked_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='api_keys', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(hash_existing_keys, migrations.RunPython.noop),
+        # التراجع يعيد العمود غير فريد أولاً، ثم يملؤه بقيم فريدة، ثم يعيد القيد
+        migrations.AlterField(
+            model_name='userprofile',
+            name='api_key',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.RunPython(migrations.RunPython.noop, reissue_legacy_keys),
+        migrations.RemoveField(
+            model_name='userprofile',
+            name='api_key',
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-19 08:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0005_apikey'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='clickanalytics',
+            name='url',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='analytics', to='shortener.url'),
+        ),
+    ]
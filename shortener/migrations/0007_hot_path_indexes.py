@@ -0,0 +1,51 @@
+# Generated by Django 4.2 on 2026-10-19 08:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0006_clickanalytics_url_no_constraint'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='url',
+            name='url_active_expiry_idx',
+        ),
+        migrations.AlterField(
+            model_name='clickanalytics',
+            name='url',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='analytics', to='shortener.url'),
+        ),
+        migrations.AddIndex(
+            model_name='clickanalytics',
+            index=models.Index(fields=['url', 'clicked_at'], name='click_url_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clickanalytics',
+            index=models.Index(fields=['url', 'ip_address'], name='click_url_ip_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clickanalytics',
+            index=models.Index(fields=['clicked_at'], name='click_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['user', 'created_at'], name='notification_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='url',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['expires_at'], name='url_active_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='url',
+            index=models.Index(fields=['user', 'is_active', 'expires_at'], name='url_user_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='url',
+            index=models.Index(fields=['user', 'created_at'], name='url_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+from django.db import OperationalError, migrations
+
+
+COLUMNS = 'title, description, original_url, tags, meta_title, meta_description'
+OLD = ', '.join(f'old.{column}' for column in COLUMNS.split(', '))
+NEW = ', '.join(f'new.{column}' for column in COLUMNS.split(', '))
+DELETE_OLD = f"INSERT INTO shortener_url_fts(shortener_url_fts, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD});"
+INSERT_NEW = f'INSERT INTO shortener_url_fts(rowid, {COLUMNS}) VALUES (new.id, {NEW});'
+
+FORWARD = [
+    f"CREATE VIRTUAL TABLE shortener_url_fts USING fts5({COLUMNS}, content='shortener_url', "
+    f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    f'CREATE TRIGGER shortener_url_fts_ai AFTER INSERT ON shortener_url BEGIN {INSERT_NEW} END',
+    f'CREATE TRIGGER shortener_url_fts_ad AFTER DELETE ON shortener_url BEGIN {DELETE_OLD} END',
+    f'CREATE TRIGGER shortener_url_fts_au AFTER UPDATE OF {COLUMNS} ON shortener_url '
+    f'BEGIN {DELETE_OLD} {INSERT_NEW} END',
+    "INSERT INTO shortener_url_fts(shortener_url_fts) VALUES ('rebuild')",
+]
+
+BACKWARD = [
+    'DROP TRIGGER IF EXISTS shortener_url_fts_ai',
+    'DROP TRIGGER IF EXISTS shortener_url_fts_ad',
+    'DROP TRIGGER IF EXISTS shortener_url_fts_au',
+    'DROP TABLE IF EXISTS shortener_url_fts',
+]
+
+
+def create_index(apps, schema_editor):
+    # SQLite فقط، وبشرط أن يكون FTS5 مضمناً؛ وإلا يعود البحث إلى LIKE
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]:
+                return
+        except OperationalError:
+            return
+        for statement in FORWARD:
+            cursor.execute(statement)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for statement in BACKWARD:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0007_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
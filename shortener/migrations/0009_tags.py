@@ -0,0 +1,91 @@
+# Generated by Django 4.2 on 2026-10-19 08:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def split_existing_tags(apps, schema_editor):
+    # نسخة مجمدة من parse_tags في models.py
+    URL = apps.get_model('shortener', 'URL')
+    Tag = apps.get_model('shortener', 'Tag')
+    URLTag = apps.get_model('shortener', 'URLTag')
+    db = schema_editor.connection.alias
+
+    def parse(text):
+        names = []
+        for tag in (text or '').split(','):
+            name = ' '.join(tag.split()).lower()[:50]
+            if name and name not in names:
+                names.append(name)
+        return names
+
+    tag_ids = {}
+    rows = URL.objects.using(db).filter(user__isnull=False).exclude(tags='').order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(rows.filter(pk__gt=last_pk).values_list('pk', 'user_id', 'tags')[:2000])
+        if not batch:
+            break
+        last_pk = batch[-1][0]
+        parsed = [(pk, user_id, parse(text)) for pk, user_id, text in batch]
+        missing = {(user_id, name) for _, user_id, names in parsed for name in names} - tag_ids.keys()
+        Tag.objects.using(db).bulk_create([Tag(user_id=user_id, name=name) for user_id, name in missing])
+        for user_id in {user_id for user_id, _ in missing}:
+            names = [name for owner, name in missing if owner == user_id]
+            for pk, name in Tag.objects.using(db).filter(user_id=user_id, name__in=names).values_list('pk', 'name'):
+                tag_ids[(user_id, name)] = pk
+        URLTag.objects.using(db).bulk_create([
+            URLTag(url_id=pk, tag_id=tag_ids[(user_id, name)])
+            for pk, user_id, names in parsed for name in names
+        ])
+
+    counts = URLTag.objects.using(db).values_list('tag_id').annotate(count=models.Count('id')).order_by()
+    Tag.objects.using(db).bulk_update(
+        [Tag(pk=tag_id, url_count=count) for tag_id, count in counts], ['url_count'], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('shortener', '0008_url_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('url_count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='tags', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='URLTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='url_links', to='shortener.tag')),
+                ('url', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='tag_links', to='shortener.url')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='urltag',
+            index=models.Index(fields=['tag', 'url'], name='urltag_tag_url_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='urltag',
+            constraint=models.UniqueConstraint(fields=('url', 'tag'), name='urltag_url_tag_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'url_count'], name='tag_user_count_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='tag_user_name_unique'),
+        ),
+        migrations.RunPython(split_existing_tags, migrations.RunPython.noop),
+    ]
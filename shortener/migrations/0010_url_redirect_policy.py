@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-19 08:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0009_tags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='url',
+            name='redirect_policy',
+            field=models.CharField(choices=[('tracked', 'متتبع (302 بدون تخزين)'), ('temporary', 'مؤقت (302 قابل للتخزين)'), ('permanent', 'دائم (301 قابل للتخزين)')], default='tracked', max_length=10),
+        ),
+    ]
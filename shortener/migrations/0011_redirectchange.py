@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-19 08:13
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0010_url_redirect_policy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RedirectChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url_id', models.BigIntegerField()),
+                ('changed_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-19 08:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0011_redirectchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LinkHealth',
+            fields=[
+                ('url', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='health', serialize=False, to='shortener.url')),
+                ('status_code', models.IntegerField(blank=True, null=True)),
+                ('ok', models.BooleanField(null=True)),
+                ('error', models.CharField(blank=True, max_length=200)),
+                ('latency_ms', models.FloatField(blank=True, null=True)),
+                ('failures', models.IntegerField(default=0)),
+                ('checked_at', models.DateTimeField(blank=True, null=True)),
+                ('next_check_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
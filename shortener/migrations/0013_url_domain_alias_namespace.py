@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-19 08:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0012_linkhealth'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='url',
+            name='custom_alias',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='url',
+            constraint=models.UniqueConstraint(fields=('custom_alias', 'domain'), name='url_alias_domain_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='url',
+            constraint=models.UniqueConstraint(condition=models.Q(('domain__isnull', True)), fields=('custom_alias',), name='url_alias_default_unique'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2 on 2026-10-19 08:35
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import migrations, models, router
+import django.db.models.deletion
+
+ID_CHUNK_SIZE = 900
+
+
+def fill_click_owners(apps, schema_editor):
+    """نسخ مالك الرابط إلى نقراته؛ فقط في القاعدة التي تحمل ClickAnalytics"""
+    ClickAnalytics = apps.get_model('shortener', 'ClickAnalytics')
+    URL = apps.get_model('shortener', 'URL')
+    alias = schema_editor.connection.alias
+    if not router.allow_migrate_model(alias, ClickAnalytics):
+        return
+    # الروابط تُقرأ من قاعدتها (قد تكون غير قاعدة التحليلات)
+    links = defaultdict(list)
+    for url_id, user_id in URL.objects.filter(user__isnull=False).values_list('id', 'user_id').iterator():
+        links[user_id].append(url_id)
+    for user_id, url_ids in links.items():
+        for i in range(0, len(url_ids), ID_CHUNK_SIZE):
+            ClickAnalytics.objects.using(alias).filter(url_id__in=url_ids[i:i + ID_CHUNK_SIZE]).update(user_id=user_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('shortener', '0013_url_domain_alias_namespace'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clickanalytics',
+            name='user',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(fill_click_owners, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='clickanalytics',
+            index=models.Index(condition=models.Q(('user__isnull', False)), fields=['user', 'clicked_at'], name='click_user_time_idx'),
+        ),
+    ]
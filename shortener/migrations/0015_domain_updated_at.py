@@ -0,0 +1,20 @@
+# Generated by Django 4.2 on 2026-10-19 09:10
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0014_clickanalytics_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='domain',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -4,10 +4,21 @@ from django.utils import timezone
 from django.core.validators import URLValidator
 import string
 import random
-import qrcode
+import hashlib
+import hmac
+import secrets
+from django.conf import settings
 import io
 import base64
-from PIL import Image
+
+def parse_tags(text):
+    """تقسيم نص الوسوم المفصول بفواصل إلى أسماء موحدة بلا تكرار"""
+    names = []
+    for tag in (text or '').split(','):
+        name = ' '.join(tag.split()).lower()[:Tag.NAME_LENGTH]
+        if name and name not in names:
+            names.append(name)
+    return names
 
 def generate_short_code():
     chars = string.ascii_letters + string.digits
@@ -18,6 +29,8 @@ class Domain(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(default=timezone.now)
+    # جزء من بصمة الجدول التي تقارنها كل عملية (domains.py)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.name
@@ -31,9 +44,19 @@ class URLCategory(models.Model):
         return self.name
 
 class URL(models.Model):
+    POLICY_TRACKED = 'tracked'
+    POLICY_TEMPORARY = 'temporary'
+    POLICY_PERMANENT = 'permanent'
+    REDIRECT_POLICIES = [
+        (POLICY_TRACKED, 'متتبع (302 بدون تخزين)'),
+        (POLICY_TEMPORARY, 'مؤقت (302 قابل للتخزين)'),
+        (POLICY_PERMANENT, 'دائم (301 قابل للتخزين)'),
+    ]
+
     original_url = models.URLField(max_length=2000)
     short_code = models.CharField(max_length=15, unique=True, default=generate_short_code)
-    custom_alias = models.CharField(max_length=50, blank=True, null=True, unique=True)
+    # فريد داخل نطاقه فقط (انظر Meta.constraints)؛ short_code المولَّد فريد على كل النطاقات
+    custom_alias = models.CharField(max_length=50, blank=True, null=True)
     title = models.CharField(max_length=200, blank=True)
     description = models.TextField(blank=True)
     
@@ -59,17 +82,31 @@ class URL(models.Model):
     qr_code = models.TextField(blank=True)  # Base64 encoded QR code
     is_active = models.BooleanField(default=True)
     tags = models.CharField(max_length=500, blank=True)  # Comma separated
+    # غير المتتبع يُخزَّن في المتصفح والوسيط؛ تغيير الهدف لا يصل لمن خزّنه قبل انتهاء max-age
+    redirect_policy = models.CharField(max_length=10, choices=REDIRECT_POLICIES, default=POLICY_TRACKED)
     
     # SEO
     meta_title = models.CharField(max_length=150, blank=True)
     meta_description = models.CharField(max_length=300, blank=True)
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # الرموز والنطاق كما حُمّلت: لإخلاء مفاتيح الكاش القديمة بعد تغييرها
+        loaded = dict(zip(field_names, values))
+        instance._loaded_codes = (loaded.get('short_code'), loaded.get('custom_alias'), loaded.get('domain_id'))
+        if 'user_id' in loaded:
+            instance._loaded_user_id = loaded['user_id']
+        return instance
+    
     def save(self, *args, **kwargs):
         if not self.qr_code:
             self.generate_qr_code()
         super().save(*args, **kwargs)
     
     def generate_qr_code(self):
+        import qrcode  # يحمّل PIL؛ لا حاجة له في عمليات إعادة التوجيه
+
         qr = qrcode.QRCode(version=1, box_size=10, border=5)
         qr.add_data(self.get_short_url())
         qr.make(fit=True)
@@ -81,10 +118,21 @@ class URL(models.Model):
         
         self.qr_code = base64.b64encode(buffer.getvalue()).decode()
     
+    def ensure_qr_code(self):
+        """توليد رمز QR عند أول حاجة إليه للروابط المستوردة (bulk_create لا يستدعي save)"""
+        if not self.qr_code:
+            self.generate_qr_code()
+            URL.objects.filter(pk=self.pk).update(qr_code=self.qr_code)
+        return self.qr_code
+    
     def get_short_url(self):
-        code = self.custom_alias or self.short_code
-        domain = self.domain.name if self.domain else "127.0.0.1:8000"
-        return f"http://{domain}/{code}"
+        return URL.short_url_for(self.custom_alias or self.short_code, self.domain_id)
+
+    @staticmethod
+    def short_url_for(code, domain_id):
+        from . import domains  # جدول النطاقات في الذاكرة: لا استعلام لكل رابط
+
+        return f"{settings.SHORT_URL_SCHEME}://{domains.name_for(domain_id)}/{code}"
     
     def is_expired(self):
         if self.expires_at:
@@ -92,16 +140,75 @@ class URL(models.Model):
         return False
     
     def get_tags_list(self):
-        return [tag.strip() for tag in self.tags.split(',') if tag.strip()]
+        # يُعاد التقسيم فقط إذا تغير النص
+        if getattr(self, '_tags_source', None) != self.tags:
+            self._tags_source, self._tags_list = self.tags, parse_tags(self.tags)
+        return self._tags_list
     
     def __str__(self):
         return f"{self.original_url} -> {self.short_code}"
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # SQLite يكتب is_active=True كعمود مجرد، لذا فهرس جزئي بدل فهرس مركب
+            models.Index(fields=['expires_at'], condition=models.Q(is_active=True), name='url_active_expiry_idx'),
+            models.Index(fields=['user', 'is_active', 'expires_at'], name='url_user_active_idx'),
+            models.Index(fields=['user', 'created_at'], name='url_user_created_idx'),
+        ]
+        constraints = [
+            # custom_alias أولاً ليخدم الفهرس البحث بالاسم وحده أيضاً
+            models.UniqueConstraint(fields=['custom_alias', 'domain'], name='url_alias_domain_unique'),
+            # NULL لا يتساوى في القيود الفريدة، لذا قيد منفصل للنطاق الافتراضي
+            models.UniqueConstraint(
+                fields=['custom_alias'], condition=models.Q(domain__isnull=True), name='url_alias_default_unique'
+            ),
+        ]
+
+class Tag(models.Model):
+    NAME_LENGTH = 50
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False, related_name='tags')
+    name = models.CharField(max_length=NAME_LENGTH)
+    # عدد روابط الوسم؛ يُحدَّث تزايدياً عبر F() في tags.py
+    url_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='tag_user_name_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'url_count'], name='tag_user_count_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+class URLTag(models.Model):
+    # القيود الفريدة والفهرس المركب تغني عن فهارس المفاتيح الأجنبية
+    url = models.ForeignKey(URL, on_delete=models.CASCADE, db_index=False, related_name='tag_links')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, db_index=False, related_name='url_links')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['url', 'tag'], name='urltag_url_tag_unique'),
+        ]
+        # (tag, url) لتصفية الروابط حسب الوسم مرتبة بالمعرف دون فرز
+        indexes = [
+            models.Index(fields=['tag', 'url'], name='urltag_tag_url_idx'),
+        ]
 
 class ClickAnalytics(models.Model):
-    url = models.ForeignKey(URL, on_delete=models.CASCADE, related_name='analytics')
+    # قد يكون الجدول في قاعدة بيانات منفصلة (انظر routers.py)، لذلك لا قيد
+    # FK ولا CASCADE على مستوى ORM؛ الحذف يتم عبر إشارة post_delete
+    url = models.ForeignKey(
+        URL, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='analytics'
+    )
+    # نسخة من URL.user: استعلامات المستخدم تستخدم فهرساً بدل قائمة معرفات روابطه
+    user = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+        null=True, blank=True, related_name='+',
+    )
     ip_address = models.GenericIPAddressField()
     user_agent = models.TextField()
     referer = models.URLField(blank=True, null=True)
@@ -120,6 +227,15 @@ class ClickAnalytics(models.Model):
     
     class Meta:
         ordering = ['-clicked_at']
+        # (url, clicked_at) يغني عن فهرس url وحده
+        indexes = [
+            models.Index(fields=['url', 'clicked_at'], name='click_url_time_idx'),
+            models.Index(fields=['url', 'ip_address'], name='click_url_ip_idx'),
+            models.Index(fields=['clicked_at'], name='click_time_idx'),
+            models.Index(
+                fields=['user', 'clicked_at'], name='click_user_time_idx', condition=models.Q(user__isnull=False)
+            ),
+        ]
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -136,18 +252,82 @@ class UserProfile(models.Model):
     weekly_reports = models.BooleanField(default=True)
     
     # API
-    api_key = models.CharField(max_length=100, unique=True, blank=True)
     api_calls_count = models.IntegerField(default=0)
     api_calls_limit = models.IntegerField(default=1000)  # Per month
+    api_calls_period = models.CharField(max_length=7, blank=True)  # YYYY-MM of api_calls_count
     
     created_at = models.DateTimeField(default=timezone.now)
     
-    def generate_api_key(self):
-        if not self.api_key:
-            chars = string.ascii_letters + string.digits
-            self.api_key = ''.join(random.choice(chars) for _ in range(32))
-            self.save()
-        return self.api_key
+    def generate_api_key(self, name=''):
+        """إصدار مفتاح API إضافي في كل استدعاء؛ يُعاد النص الخام مرة واحدة فقط.
+        لم تعد تعيد المفتاح السابق: المفاتيح تُحفظ مجزأة، والقديمة تبقى صالحة حتى تُلغى"""
+        raw_key, _ = APIKey.issue(self.user, name)
+        return raw_key
+
+class APIKey(models.Model):
+    PREFIX_LENGTH = 8
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='api_keys')
+    name = models.CharField(max_length=100, blank=True)
+    prefix = models.CharField(max_length=PREFIX_LENGTH, db_index=True)
+    key_hash = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    revoked_at = models.DateTimeField(null=True, blank=True)
+
+    @staticmethod
+    def hash_key(raw_key):
+        secret = getattr(settings, 'API_KEY_HASH_SECRET', settings.SECRET_KEY)
+        return hmac.new(secret.encode(), raw_key.encode(), hashlib.sha256).hexdigest()
+
+    @classmethod
+    def issue(cls, user, name=''):
+        raw_key = secrets.token_urlsafe(32)
+        api_key = cls.objects.create(
+            user=user,
+            name=name,
+            prefix=raw_key[:cls.PREFIX_LENGTH],
+            key_hash=cls.hash_key(raw_key),
+        )
+        return raw_key, api_key
+
+    def revoke(self):
+        self.revoked_at = timezone.now()
+        self.save(update_fields=['revoked_at'])
+
+    def rotate(self):
+        """إلغاء هذا المفتاح وإصدار بديل بنفس الاسم"""
+        self.revoke()
+        return APIKey.issue(self.user, self.name)
+
+    def __str__(self):
+        return f"{self.prefix}… ({self.user})"
+
+class LinkHealth(models.Model):
+    """نتيجة آخر فحص لرابط الوجهة؛ يُحدَّث من linkhealth.py"""
+    BROKEN_AFTER = 2  # فشل متتالٍ قبل اعتبار الرابط معطلاً
+
+    url = models.OneToOneField(URL, on_delete=models.CASCADE, primary_key=True, related_name='health')
+    status_code = models.IntegerField(null=True, blank=True)
+    ok = models.BooleanField(null=True)
+    error = models.CharField(max_length=200, blank=True)
+    latency_ms = models.FloatField(null=True, blank=True)
+    failures = models.IntegerField(default=0)
+    checked_at = models.DateTimeField(null=True, blank=True)
+    next_check_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    @property
+    def is_broken(self):
+        return self.failures >= self.BROKEN_AFTER
+
+class RedirectChange(models.Model):
+    """سجل تغييرات الروابط لإعادة بناء خرائط إعادة التوجيه تزايدياً"""
+    # ليس FK: يبقى السجل بعد حذف الرابط
+    url_id = models.BigIntegerField()
+    changed_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    @classmethod
+    def record(cls, url_ids):
+        cls.objects.bulk_create([cls(url_id=url_id) for url_id in set(url_ids)])
 
 class Notification(models.Model):
     TYPES = [
@@ -165,4 +345,7 @@ class Notification(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at'], condition=models.Q(is_read=False), name='notification_unread_idx'),
+        ]
\ No newline at end of file
@@ -0,0 +1,43 @@
+"""ترقيم بمؤشر (keyset) للقوائم الأحدث أولاً؛ الصفحة N بتكلفة الصفحة الأولى.
+
+المؤشر بصيغة exports.encode_cursor: (الوقت، المعرف) لآخر صف في الصفحة.
+"""
+from django.db.models import Q
+
+from .exports import decode_cursor, encode_cursor
+from .models import URL
+
+LINK_FIELDS = [
+    'id', 'short_code', 'custom_alias', 'original_url', 'title', 'tags', 'created_at', 'expires_at',
+    'click_count', 'unique_clicks', 'last_clicked', 'is_active', 'is_private', 'redirect_policy',
+    'domain_id',
+]
+CLICK_FIELDS = [
+    'id', 'clicked_at', 'country', 'city', 'device_type', 'browser', 'os', 'referer', 'is_unique',
+]
+
+
+def before_cursor(field, moment, pk):
+    # الشرط field <= ... منفصلاً ليبحث SQLite في نطاق الفهرس (كما في exports.after_cursor)
+    return Q(**{f'{field}__lte': moment}) & (Q(**{f'{field}__lt': moment}) | Q(id__lt=pk))
+
+
+def keyset_page(queryset, field, cursor=None, limit=20):
+    """صفحة مرتبة تنازلياً على (field, id)؛ يعيد (الصفوف، مؤشر الصفحة التالية أو None)"""
+    queryset = queryset.order_by(f'-{field}', '-id')
+    if cursor:
+        queryset = queryset.filter(before_cursor(field, *decode_cursor(cursor)))
+    rows = list(queryset[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    return rows[:limit], encode_cursor(getattr(last, field), last.pk)
+
+
+def user_links(user_id):
+    # بدون qr_code ولا الوصف: الصفحة لا تعرضهما
+    return URL.objects.filter(user_id=user_id).only(*LINK_FIELDS)
+
+
+def link_clicks(url):
+    return url.analytics.only(*CLICK_FIELDS)
@@ -0,0 +1,157 @@
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+
+RateLimitResult = namedtuple('RateLimitResult', ['allowed', 'limit', 'remaining', 'reset'])
+
+# استدعاءات هذه العملية غير المحفوظة بعد: {(profile_id, period): عدد}
+_pending_usage = {}
+_dirty_lock = threading.Lock()
+_last_usage_flush = time.monotonic()
+
+
+def parse_rate(rate):
+    """'60/m' -> (60, 60)"""
+    count, period = rate.split('/')
+    seconds = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[-1]]
+    multiplier = int(period[:-1]) if len(period) > 1 else 1
+    return int(count), seconds * multiplier
+
+
+def _incr(key, timeout, initial=0):
+    cache.add(key, initial, timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # انتهت صلاحية المفتاح بين add و incr
+        cache.add(key, initial + 1, timeout)
+        return initial + 1
+
+
+def _sliding_window(identity, rate):
+    """نافذة منزلقة تقريبية: العداد الحالي + نسبة من عداد النافذة السابقة؛ تعيد (النتيجة، المفتاح)"""
+    limit, window = parse_rate(rate)
+    now = time.time()
+    current_window = int(now // window)
+    elapsed = (now % window) / window
+    key = f'rl:{identity}:{window}:{current_window}'
+
+    current = _incr(key, window * 2)
+    previous = cache.get(f'rl:{identity}:{window}:{current_window - 1}', 0)
+    estimate = previous * (1 - elapsed) + current
+    reset = int(window - now % window)
+
+    if estimate > limit:
+        _decr(key)
+        return RateLimitResult(False, limit, 0, reset), key
+    return RateLimitResult(True, limit, max(0, int(limit - estimate)), reset), key
+
+
+def _decr(key):
+    try:
+        cache.decr(key)
+    except ValueError:
+        # انتهت صلاحية المفتاح؛ لا شيء لإرجاعه
+        pass
+
+
+def sliding_window(identity, rate):
+    return _sliding_window(identity, rate)[0]
+
+
+def current_period():
+    return timezone.now().strftime('%Y-%m')
+
+
+def _usage_key(profile_id, period):
+    return f'api_usage:{profile_id}:{period}'
+
+
+def monthly_quota(profile_id, limit, stored_count=0, stored_period=''):
+    """حصة الاستدعاءات الشهرية؛ العداد في الكاش ويُنسخ إلى UserProfile لاحقاً"""
+    period = current_period()
+    key = _usage_key(profile_id, period)
+    # عند فقدان الكاش نبدأ من القيمة المحفوظة لنفس الشهر
+    used = _incr(key, 40 * 86400, stored_count if stored_period == period else 0)
+
+    now = timezone.now()
+    next_month = (now.replace(day=1) + timedelta(days=32)).replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+    reset = int((next_month - now).total_seconds())
+
+    if used > limit:
+        _decr(key)
+        return RateLimitResult(False, limit, 0, reset)
+    _record_usage(profile_id, period)
+    return RateLimitResult(True, limit, limit - used, reset)
+
+
+def check_api_key(profile_id, calls_limit, stored_count=0, stored_period=''):
+    """حد المعدل لكل مفتاح API ثم الحصة الشهرية"""
+    burst, burst_key = _sliding_window(f'key:{profile_id}', settings.RATE_LIMITS['api_key'])
+    if not burst.allowed:
+        return burst
+    quota = monthly_quota(profile_id, calls_limit, stored_count, stored_period)
+    if not quota.allowed:
+        # الطلب المرفوض بالحصة لا يُحتسب من حد المعدل
+        _decr(burst_key)
+        return quota
+    return min(burst, quota, key=lambda result: result.remaining)
+
+
+def check_anonymous(ip_address):
+    """حد المعدل للطلبات دون مفتاح، حسب عنوان IP"""
+    return sliding_window(f'ip:{ip_address}', settings.RATE_LIMITS['anonymous'])
+
+
+def apply_headers(response, result):
+    response['RateLimit-Limit'] = str(result.limit)
+    response['RateLimit-Remaining'] = str(result.remaining)
+    response['RateLimit-Reset'] = str(result.reset)
+    if not result.allowed:
+        response['Retry-After'] = str(result.reset)
+    return response
+
+
+def _record_usage(profile_id, period):
+    with _dirty_lock:
+        _pending_usage[profile_id, period] = _pending_usage.get((profile_id, period), 0) + 1
+    if time.monotonic() - _last_usage_flush >= getattr(settings, 'API_USAGE_FLUSH_INTERVAL', 30):
+        flush_usage()
+
+
+def flush_usage():
+    """إضافة استدعاءات هذه العملية إلى UserProfile.api_calls_count؛ يعيد عدد الملفات المحدثة"""
+    global _pending_usage, _last_usage_flush
+    from .models import UserProfile
+
+    with _dirty_lock:
+        pending, _pending_usage = _pending_usage, {}
+        _last_usage_flush = time.monotonic()
+    if not pending:
+        return 0
+
+    # زيادات نسبية عبر F(): كل عامل يضيف ما عدّه هو، فلا يكتب فوق عدّ غيره.
+    # استعلام UPDATE واحد لكل (فترة، زيادة) مختلفة
+    groups = {}
+    for (profile_id, period), delta in pending.items():
+        groups.setdefault((period, delta), []).append(profile_id)
+    with transaction.atomic():
+        for (period, delta), profile_ids in groups.items():
+            UserProfile.objects.filter(pk__in=profile_ids).update(
+                api_calls_count=Case(
+                    When(api_calls_period=period, then=F('api_calls_count') + delta),
+                    default=Value(delta),
+                ),
+                api_calls_period=period,
+            )
+    return len(pending)
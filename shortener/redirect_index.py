@@ -0,0 +1,220 @@
+"""فهرس إعادة توجيه على القرص يُقرأ عبر mmap، نسخة واحدة مشتركة بين كل العمال.
+
+البنية: ترويسة، ثم سجلات ثابتة الحجم مرتبة حسب بصمة الرمز (64 بت)، ثم كتلة
+نصوص فيها "key\\ttarget" لكل سجل للتحقق من التصادم وقراءة الهدف، والمفتاح هو
+الرمز مقيداً بنطاقه (domains.scoped).
+الروابط المعدلة بعد البناء (RedirectChange) تُتجاوز وتُخدم من الكاش/قاعدة البيانات.
+فهرس لا يمكن معرفة ما تغير بعده (سجلات حُذفت) أو ملف تالف يُتجاهل بالكامل.
+"""
+import bisect
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from . import domains
+from .models import URL, RedirectChange
+
+MAGIC = b'URIX'
+VERSION = 2
+HEADER = struct.Struct('<4sIQdQQ')  # magic, version, count, built_at, last_change_id, blob_offset
+RECORD = struct.Struct('<QQQIdB3x')  # hash, url_id, blob_offset, blob_length, expires_at, flags
+POLICIES = [URL.POLICY_TRACKED, URL.POLICY_TEMPORARY, URL.POLICY_PERMANENT]
+PROTECTED = 0x4
+# أخطاء ملف ناقص أو تالف (ValueError يشمل mmap لملف فارغ وفك ترميز النصوص)
+CORRUPT = (ValueError, IndexError, OSError, struct.error)
+
+logger = logging.getLogger(__name__)
+
+
+def code_hash(code):
+    return int.from_bytes(hashlib.blake2b(code.encode(), digest_size=8).digest(), 'little')
+
+
+def build(path):
+    """بناء الفهرس من الروابط النشطة وكتابته ذرياً؛ يعيد عدد الرموز"""
+    # آخر تغيير قبل القراءة: ما يتغير أثناء البناء يُعامل كمتسخ
+    last_change = RedirectChange.objects.aggregate(last=Max('id'))['last'] or 0
+    now = timezone.now()
+    rows = URL.objects.filter(is_active=True).order_by().values_list(
+        'id', 'short_code', 'custom_alias', 'domain_id', 'original_url', 'expires_at', 'redirect_policy', 'password'
+    )
+    records = []
+    blob = bytearray()
+    for url_id, short_code, custom_alias, domain_id, original_url, expires_at, policy, password in rows.iterator(
+        chunk_size=5000
+    ):
+        if expires_at is not None and expires_at <= now:
+            continue
+        flags = POLICIES.index(policy) | (PROTECTED if password else 0)
+        expires = expires_at.timestamp() if expires_at else 0.0
+        for code in (short_code, custom_alias):
+            if code:
+                key = domains.scoped(code, domain_id)
+                data = f'{key}\t{original_url}'.encode()
+                records.append((code_hash(key), url_id, len(blob), len(data), expires, flags))
+                blob += data
+    records.sort()
+
+    blob_offset = HEADER.size + RECORD.size * len(records)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as fh:
+        fh.write(HEADER.pack(MAGIC, VERSION, len(records), time.time(), last_change, blob_offset))
+        for record in records:
+            fh.write(RECORD.pack(*record))
+        fh.write(blob)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+    return len(records)
+
+
+class _Hashes:
+    """تسلسل البصمات فوق mmap ليعمل bisect دون نسخ"""
+
+    def __init__(self, buffer, count):
+        self.buffer = buffer
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        return struct.unpack_from('<Q', self.buffer, HEADER.size + index * RECORD.size)[0]
+
+
+class RedirectIndex:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as fh:
+            self.stat = os.fstat(fh.fileno())
+            self.buffer = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, self.built_at, self.last_change_id, self.blob_offset = HEADER.unpack_from(
+            self.buffer, 0
+        )
+        if magic != MAGIC or version != VERSION:
+            self.buffer.close()
+            raise ValueError(f'{path} is not a redirect index')
+        self.hashes = _Hashes(self.buffer, self.count)
+
+    def close(self):
+        self.buffer.close()
+
+    def lookup(self, key):
+        """(url_id, entry) أو None؛ key هو الرمز مقيداً بنطاقه"""
+        key_hash = code_hash(key)
+        index = bisect.bisect_left(self.hashes, key_hash)
+        while index < self.count:
+            record_hash, url_id, offset, length, expires, flags = RECORD.unpack_from(
+                self.buffer, HEADER.size + index * RECORD.size
+            )
+            if record_hash != key_hash:
+                return None
+            start = self.blob_offset + offset
+            stored_key, target = bytes(self.buffer[start:start + length]).decode().split('\t', 1)
+            if stored_key == key:
+                return url_id, {
+                    'id': url_id,
+                    'url': target,
+                    'expires_at': datetime.fromtimestamp(expires, dt_timezone.utc) if expires else None,
+                    'policy': POLICIES[flags & 0x3],
+                    'protected': bool(flags & PROTECTED),
+                }
+            index += 1
+        return None
+
+
+_lock = threading.Lock()
+_index = None
+_dirty = set()
+_dirty_after = 0
+_last_check = 0.0
+_rejected = None  # (inode, mtime) لملف رُفض؛ لا يُعاد فتحه حتى يُستبدل
+
+
+def _file_key(stat):
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def _reject(key, reason):
+    global _index, _dirty, _rejected
+    if key != _rejected:
+        logger.warning('Ignoring redirect index %s: %s', settings.REDIRECT_INDEX_PATH, reason)
+    _index, _dirty, _rejected = None, set(), key
+
+
+def _refresh():
+    """كل REDIRECT_INDEX_REFRESH ثانية: تبديل الملف إن أعيد بناؤه، وتحميل الروابط المتغيرة منذ بنائه"""
+    global _index, _dirty, _dirty_after, _last_check
+    _last_check = time.monotonic()
+    path = settings.REDIRECT_INDEX_PATH
+    try:
+        stat = os.stat(path)
+    except OSError:
+        _index, _dirty = None, set()
+        return
+    key = _file_key(stat)
+    if _index is None or key != _file_key(_index.stat):
+        if key == _rejected:
+            return
+        # لا نغلق الفهرس القديم: قد تكون خيوط أخرى تقرأ منه، ويُحرر عند جمع القمامة
+        try:
+            index = RedirectIndex(path)
+        except CORRUPT as exc:
+            # ملف بإصدار أقدم أو ناقص: الخدمة من الكاش وقاعدة البيانات حتى إعادة البناء
+            _reject(key, exc)
+            return
+        _index, _dirty, _dirty_after = index, set(), index.last_change_id
+    # export_redirect_map --prune-days يحذف السجلات القديمة؛ إن حُذف ما بعد آخر سجل قرأناه
+    # فلا نعرف أي الروابط تغيرت، والفهرس لا يصلح حتى يُعاد بناؤه
+    oldest = RedirectChange.objects.aggregate(oldest=Min('id'))['oldest']
+    if oldest is not None and oldest > _dirty_after + 1:
+        _reject(key, f'change log pruned past id {_dirty_after}')
+        return
+    changes = list(
+        RedirectChange.objects.filter(id__gt=_dirty_after).order_by('id').values_list('id', 'url_id')
+    )
+    if changes:
+        _dirty_after = changes[-1][0]
+        _dirty.update(url_id for _, url_id in changes)
+
+
+def lookup(code, domain_id=None):
+    """البحث في الفهرس المشترك؛ None يعني: ارجع إلى الكاش وقاعدة البيانات"""
+    global _index, _dirty
+    if not settings.REDIRECT_INDEX_PATH:
+        return None
+    if time.monotonic() - _last_check >= settings.REDIRECT_INDEX_REFRESH:
+        with _lock:
+            if time.monotonic() - _last_check >= settings.REDIRECT_INDEX_REFRESH:
+                try:
+                    _refresh()
+                except DatabaseError:
+                    # الروابط المتغيرة غير معروفة: لا نخدم من الفهرس حتى ينجح التحديث التالي
+                    logger.exception('Redirect index refresh failed')
+                    _index, _dirty = None, set()
+    index, dirty = _index, _dirty
+    if index is None:
+        return None
+    try:
+        found = index.lookup(domains.scoped(code, domain_id))
+    except CORRUPT as exc:
+        with _lock:
+            if _index is index:
+                _reject(_file_key(index.stat), exc)
+        return None
+    if found is None or found[0] in dirty:
+        return None
+    entry = found[1]
+    if entry['expires_at'] is not None and entry['expires_at'] <= timezone.now():
+        return None
+    return entry
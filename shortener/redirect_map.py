@@ -0,0 +1,163 @@
+"""خرائط إعادة التوجيه لـ nginx: ملف لكل نطاق ونوع تحويل.
+
+كل سطر بالشكل  "/code" "https://target"; # <url_id>
+ويُضمَّن داخل كتلة map، مثلاً:
+
+    map $uri $permanent_target { include /etc/nginx/redirects/example.com.permanent.map; }
+    map $uri $temporary_target { include /etc/nginx/redirects/example.com.temporary.map; }
+    if ($permanent_target) { return 301 $permanent_target; }
+    if ($temporary_target) { return 302 $temporary_target; }
+"""
+import glob
+import hashlib
+import json
+import os
+import re
+from datetime import timedelta
+from urllib.parse import quote
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .analytics import ID_CHUNK_SIZE
+from .models import URL
+
+DEFAULT_DOMAIN = '_default'
+KINDS = (URL.POLICY_PERMANENT, URL.POLICY_TEMPORARY)
+STATE_FILE = '.state.json'
+CHECKSUM_FILE = 'redirect-maps.sha256'
+
+LINE_RE = re.compile(r'^"[^"]*" "[^"]*"; # (\d+)$')
+_UNSAFE = re.compile(r'["\\$\s]')
+
+
+def _escape(value):
+    # داخل سلاسل nginx: علامات الاقتباس و$ والمسافات تُرمَّز كـ %XX
+    return _UNSAFE.sub(lambda match: quote(match.group(), safe=''), value)
+
+
+def eligible(now=None, expiry_margin=3600):
+    """روابط يمكن للوسيط خدمتها دون Python: نشطة، بلا كلمة مرور، غير متتبعة، ولا تنتهي قريباً"""
+    horizon = (now or timezone.now()) + timedelta(seconds=expiry_margin)
+    return URL.objects.filter(
+        Q(expires_at__isnull=True) | Q(expires_at__gt=horizon),
+        Q(domain__isnull=True) | Q(domain__is_active=True),
+        is_active=True,
+        password='',
+        redirect_policy__in=KINDS,
+    )
+
+
+def _rows(queryset):
+    return queryset.order_by().values_list(
+        'id', 'short_code', 'custom_alias', 'original_url', 'redirect_policy', 'domain__name'
+    )
+
+
+def _lines(url_id, short_code, custom_alias, original_url):
+    target = _escape(original_url)
+    lines = []
+    for code in (short_code, custom_alias):
+        if code:
+            key = _escape(code)
+            lines.append(f'"/{key}" "{target}"; # {url_id}')
+            lines.append(f'"/{key}/" "{target}"; # {url_id}')
+    return lines
+
+
+def file_name(domain, kind):
+    safe = re.sub(r'[^A-Za-z0-9.-]', '_', domain or DEFAULT_DOMAIN)
+    return f'{safe}.{kind}.map'
+
+
+class RedirectMaps:
+    """محتوى الملفات: {اسم الملف: {url_id: [أسطر]}}"""
+
+    def __init__(self):
+        self.files = {}
+
+    def add_rows(self, rows):
+        for url_id, short_code, custom_alias, original_url, policy, domain in rows:
+            self.files.setdefault(file_name(domain, policy), {})[url_id] = _lines(
+                url_id, short_code, custom_alias, original_url
+            )
+
+    def discard(self, url_ids):
+        for entries in self.files.values():
+            for url_id in url_ids:
+                entries.pop(url_id, None)
+
+    @classmethod
+    def load(cls, directory):
+        maps = cls()
+        for path in glob.glob(os.path.join(directory, '*.map')):
+            entries = maps.files.setdefault(os.path.basename(path), {})
+            with open(path) as fh:
+                for line in fh:
+                    match = LINE_RE.match(line.rstrip('\n'))
+                    if match:
+                        entries.setdefault(int(match.group(1)), []).append(match.group(0))
+        return maps
+
+    def render(self, name):
+        lines = sorted(line for entries in self.files[name].values() for line in entries)
+        return ''.join(f'{line}\n' for line in lines)
+
+
+def build_full(now=None, expiry_margin=3600):
+    maps = RedirectMaps()
+    maps.add_rows(_rows(eligible(now, expiry_margin)).iterator(chunk_size=5000))
+    return maps
+
+
+def apply_changes(maps, url_ids, now=None, expiry_margin=3600):
+    """إعادة حساب الروابط المتغيرة فقط: حذف أسطرها من كل الملفات ثم إضافة المؤهل منها"""
+    url_ids = list(url_ids)
+    maps.discard(url_ids)
+    for i in range(0, len(url_ids), ID_CHUNK_SIZE):
+        maps.add_rows(_rows(eligible(now, expiry_margin).filter(pk__in=url_ids[i:i + ID_CHUNK_SIZE])))
+    return maps
+
+
+def read_state(directory):
+    try:
+        with open(os.path.join(directory, STATE_FILE)) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _atomic_write(path, content):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as fh:
+        fh.write(content)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+
+
+def write(maps, directory, state):
+    """كتابة الملفات المتغيرة فقط بشكل ذري، ثم ملف المجاميع؛ يعيد أسماء الملفات المتغيرة"""
+    os.makedirs(directory, exist_ok=True)
+    # ملفات بلا روابط تُكتب فارغة: nginx يفشل إن غاب ملف مضمَّن أو بقيت أسطر قديمة
+    names = set(maps.files) | {os.path.basename(path) for path in glob.glob(os.path.join(directory, '*.map'))}
+    for name in names | {f'{name.rsplit(".", 2)[0]}.{kind}.map' for name in names for kind in KINDS}:
+        maps.files.setdefault(name, {})
+    previous = dict(state.get('checksums', {}))
+    checksums = {}
+    changed = []
+    for name in sorted(maps.files):
+        content = maps.render(name)
+        checksum = hashlib.sha256(content.encode()).hexdigest()
+        checksums[name] = checksum
+        if previous.get(name) != checksum or not os.path.exists(os.path.join(directory, name)):
+            _atomic_write(os.path.join(directory, name), content)
+            changed.append(name)
+    if changed:
+        _atomic_write(
+            os.path.join(directory, CHECKSUM_FILE),
+            ''.join(f'{checksum}  {name}\n' for name, checksum in sorted(checksums.items())),
+        )
+    state['checksums'] = checksums
+    _atomic_write(os.path.join(directory, STATE_FILE), json.dumps(state, indent=2, sort_keys=True))
+    return changed
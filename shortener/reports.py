@@ -0,0 +1,222 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .analytics import clicks_for_user
+from .models import URL
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def current_period():
+    return timezone.now().strftime('%Y-%m')
+
+
+def period_bounds(period):
+    """حدود الفترة الشهرية بصيغة YYYY-MM"""
+    start = timezone.make_aware(datetime.strptime(period, '%Y-%m'))
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def report_fingerprint(user, period):
+    """بصمة رخيصة لبيانات الفترة: روابط أُنشئت قبل نهايتها ونقرات داخلها.
+    تقرير شهر منتهٍ لا يُعاد رسمه مع كل نقرة جديدة؛ إجمالياته تبقى كما كانت عند رسمه"""
+    start, end = period_bounds(period)
+    links = URL.objects.filter(user=user, created_at__lt=end).aggregate(
+        links=Count('id'),
+        last_created=Max('created_at'),
+    )
+    clicks = clicks_for_user(user.pk).filter(clicked_at__gte=start, clicked_at__lt=end).aggregate(
+        clicks=Count('id'),
+        last_click=Max('id'),
+    )
+    state = {**links, **clicks}
+    raw = '|'.join(str(state[key]) for key in ('links', 'last_created', 'clicks', 'last_click'))
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def report_path(user, period, fingerprint):
+    return os.path.join(settings.REPORTS_DIR, str(user.pk), f'{period}-{fingerprint}.pdf')
+
+
+def build_report_data(user, period):
+    """تجميع بيانات التقرير في عدد ثابت من الاستعلامات المجمعة"""
+    start, end = period_bounds(period)
+    # الحد نفسه الذي تغطيه البصمة: رابط جديد لا يغيّر تقرير فترة سابقة
+    urls = URL.objects.filter(user=user, created_at__lt=end)
+    clicks = clicks_for_user(user.pk).filter(clicked_at__gte=start, clicked_at__lt=end)
+
+    totals = urls.aggregate(
+        total_urls=Count('id'),
+        active_urls=Count('id', filter=Q(is_active=True)),
+        total_clicks=Sum('click_count'),
+    )
+    period_clicks = dict(clicks.values_list('url_id').annotate(count=Count('id')))
+    daily = dict(
+        clicks.annotate(day=TruncDate('clicked_at')).values_list('day').annotate(count=Count('id'))
+    )
+    devices = list(
+        clicks.values_list('device_type').annotate(count=Count('id')).order_by('-count')[:6]
+    )
+    links = [
+        {
+            'title': title or original_url,
+            'code': custom_alias or short_code,
+            'clicks': click_count,
+            'period_clicks': period_clicks.get(pk, 0),
+        }
+        for pk, title, original_url, short_code, custom_alias, click_count in urls.order_by(
+            '-click_count', 'pk'
+        ).values_list('pk', 'title', 'original_url', 'short_code', 'custom_alias', 'click_count').iterator()
+    ]
+
+    days = []
+    day = start.date()
+    while day < end.date():
+        days.append((day, daily.get(day, 0)))
+        day += timedelta(days=1)
+
+    return {
+        'username': user.username,
+        'period': period,
+        'total_urls': totals['total_urls'],
+        'active_urls': totals['active_urls'],
+        'total_clicks': totals['total_clicks'] or 0,
+        'period_clicks': sum(period_clicks.values()),
+        'daily': days,
+        'devices': [(name or 'unknown', count) for name, count in devices],
+        'links': links,
+    }
+
+
+def render_report(data, path):
+    """رسم ملف PDF: الملخص، الرسوم البيانية، ثم جدول الروابط كاملاً عبر الصفحات"""
+    from reportlab.graphics.charts.barcharts import VerticalBarChart
+    from reportlab.graphics.charts.piecharts import Pie
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    styles = getSampleStyleSheet()
+    story = [
+        Paragraph(f"تقرير شهري للمستخدم: {data['username']} ({data['period']})", styles['Title']),
+        Paragraph(f"إجمالي الروابط: {data['total_urls']} / النشطة: {data['active_urls']}", styles['Normal']),
+        Paragraph(f"إجمالي النقرات: {data['total_clicks']} / هذا الشهر: {data['period_clicks']}", styles['Normal']),
+        Spacer(1, 12),
+    ]
+
+    chart = Drawing(460, 180)
+    bars = VerticalBarChart()
+    bars.x, bars.y, bars.width, bars.height = 30, 30, 420, 130
+    bars.data = [[count for _, count in data['daily']] or [0]]
+    bars.categoryAxis.categoryNames = [day.strftime('%d') for day, _ in data['daily']]
+    bars.categoryAxis.labels.fontSize = 6
+    bars.valueAxis.valueMin = 0
+    bars.bars[0].fillColor = colors.HexColor('#007bff')
+    chart.add(bars)
+    story += [chart, Spacer(1, 12)]
+
+    if data['devices']:
+        pie_drawing = Drawing(460, 160)
+        pie = Pie()
+        pie.x, pie.y, pie.width, pie.height = 160, 10, 140, 140
+        pie.data = [count for _, count in data['devices']]
+        pie.labels = [name for name, _ in data['devices']]
+        pie_drawing.add(pie)
+        story += [pie_drawing, Spacer(1, 12)]
+
+    rows = [['الرابط', 'الرمز', 'النقرات', 'هذا الشهر']]
+    rows += [
+        [link['title'][:60], link['code'], link['clicks'], link['period_clicks']]
+        for link in data['links']
+    ]
+    table = Table(rows, repeatRows=1, colWidths=[280, 90, 60, 70])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#007bff')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f2f2f2')]),
+    ]))
+    story.append(table)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # ملف مؤقت فريد: قد يرسم عاملان التقرير نفسه في الوقت ذاته
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix='.pdf.tmp', delete=False) as fh:
+        tmp_path = fh.name
+    try:
+        SimpleDocTemplate(tmp_path, pagesize=letter).build(story)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _remove_stale(user, period, keep):
+    directory = os.path.dirname(keep)
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.startswith(f'{period}-') and name.endswith('.pdf') and path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def build_report(user, period):
+    """بناء التقرير إن لم تكن نسخته الحالية موجودة، وإرجاع مساره"""
+    path = report_path(user, period, report_fingerprint(user, period))
+    if not os.path.exists(path):
+        render_report(build_report_data(user, period), path)
+        _remove_stale(user, period, path)
+    return path
+
+
+def cached_report(user, period):
+    """مسار التقرير الجاهز إن كان محدثاً، وإلا None"""
+    path = report_path(user, period, report_fingerprint(user, period))
+    return path if os.path.exists(path) else None
+
+
+def _run_job(user, period):
+    try:
+        return build_report(user, period)
+    except Exception:
+        logger.exception('Report generation failed for user %s (%s)', user.pk, period)
+        raise
+    finally:
+        with _pending_lock:
+            _pending.pop((user.pk, period), None)
+        connection.close()
+
+
+def request_report(user, period):
+    """جدولة بناء التقرير في الخلفية (مرة واحدة لكل مستخدم وفترة)"""
+    global _executor
+    key = (user.pk, period)
+    with _pending_lock:
+        if key in _pending:
+            return _pending[key]
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'REPORT_WORKERS', 2),
+                thread_name_prefix='reports',
+            )
+        future = _pending[key] = _executor.submit(_run_job, user, period)
+    return future
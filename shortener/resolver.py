@@ -0,0 +1,105 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from . import domains, redirect_index
+from .instrumentation import record_cache
+from .models import URL
+
+
+MISSING = 'missing'
+ENTRY_FIELDS = ('id', 'original_url', 'expires_at', 'redirect_policy', 'password')
+
+
+def cache_key(code, domain_id=None):
+    return f'redirect:{domains.scoped(code, domain_id)}'
+
+
+def _ttl(expires_at):
+    """مدة الكاش لا تتجاوز وقت انتهاء الرابط، فلا حاجة لفحص الانتهاء عند الطلب"""
+    ttl = getattr(settings, 'REDIRECT_CACHE_TTL', 300)
+    if expires_at is not None:
+        ttl = min(ttl, int((expires_at - timezone.now()).total_seconds()))
+    return ttl
+
+
+def entry_queryset(code, domain_id=None):
+    # بدون ترتيب: الرمز والاسم المخصص فريدان داخل النطاق فلا حاجة لفرز مؤقت
+    return URL.objects.filter(
+        Q(short_code=code) | Q(custom_alias=code),
+        Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now()),
+        domain_id=domain_id,
+        is_active=True,
+    ).order_by().values(*ENTRY_FIELDS)
+
+
+def _entry(row):
+    return {
+        'id': row['id'],
+        'url': row['original_url'],
+        'expires_at': row['expires_at'],
+        'policy': row['redirect_policy'],
+        'protected': bool(row['password']),
+    }
+
+
+def load_entry(code, domain_id=None):
+    rows = entry_queryset(code, domain_id)[:1]
+    return _entry(rows[0]) if rows else None
+
+
+def resolve(code, domain_id=None):
+    """إرجاع بيانات إعادة التوجيه للرمز داخل نطاقه من الفهرس المشترك أو الكاش أو قاعدة البيانات"""
+    if settings.REDIRECT_INDEX_PATH:
+        entry = redirect_index.lookup(code, domain_id)
+        record_cache('redirect_index', entry is not None)
+        if entry is not None:
+            return entry
+
+    key = cache_key(code, domain_id)
+    entry = cache.get(key)
+    if entry is not None:
+        record_cache('redirect', True)
+        return None if entry == MISSING else entry
+
+    record_cache('redirect', False)
+    entry = load_entry(code, domain_id)
+    if entry is None:
+        cache.set(key, MISSING, getattr(settings, 'REDIRECT_NEGATIVE_CACHE_TTL', 30))
+        return None
+    ttl = _ttl(entry['expires_at'])
+    if ttl > 0:
+        cache.set(key, entry, ttl)
+    return entry
+
+
+def evict(codes, domain_id=None):
+    """حذف رموز نطاق من كاش إعادة التوجيه"""
+    keys = [cache_key(code, domain_id) for code in codes if code]
+    if keys:
+        cache.delete_many(keys)
+
+
+def prime(limit=1000):
+    """تحميل أكثر الروابط نقراً في الكاش دفعة واحدة (عند الإقلاع)"""
+    default_ttl = getattr(settings, 'REDIRECT_CACHE_TTL', 300)
+    rows = URL.objects.filter(
+        Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now()),
+        is_active=True,
+    ).order_by('-click_count').values(*ENTRY_FIELDS, 'short_code', 'custom_alias', 'domain_id')[:limit]
+
+    batch = {}
+    for row in rows:
+        entry = _entry(row)
+        ttl = _ttl(entry['expires_at'])
+        for code in (row['short_code'], row['custom_alias']):
+            if not code:
+                continue
+            key = cache_key(code, row['domain_id'])
+            if ttl == default_ttl:
+                batch[key] = entry
+            elif ttl > 0:
+                cache.set(key, entry, ttl)
+    cache.set_many(batch, default_ttl)
+    return len(rows)
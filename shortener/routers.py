@@ -0,0 +1,40 @@
+from django.conf import settings
+
+
+ANALYTICS_DB = 'analytics'
+
+# النماذج التي تُخزن في قاعدة بيانات التحليلات المنفصلة
+ANALYTICS_MODELS = {'clickanalytics'}
+
+
+def analytics_enabled():
+    return ANALYTICS_DB in settings.DATABASES
+
+
+class AnalyticsRouter:
+    """توجيه ClickAnalytics (وجداول التجميع) إلى قاعدة 'analytics' عند تعريفها"""
+
+    def _is_analytics(self, model):
+        return model._meta.app_label == 'shortener' and model._meta.model_name in ANALYTICS_MODELS
+
+    def db_for_read(self, model, **hints):
+        if analytics_enabled() and self._is_analytics(model):
+            return ANALYTICS_DB
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if analytics_enabled() and (self._is_analytics(type(obj1)) or self._is_analytics(type(obj2))):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if not analytics_enabled():
+            return None
+        is_analytics = app_label == 'shortener' and model_name in ANALYTICS_MODELS
+        if db == ANALYTICS_DB:
+            return is_analytics
+        if is_analytics:
+            return False
+        return None
@@ -0,0 +1,120 @@
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import URL
+
+
+FTS_TABLE = 'shortener_url_fts'
+FTS_COLUMNS = ['title', 'description', 'original_url', 'tags', 'meta_title', 'meta_description']
+# أوزان bm25 بنفس ترتيب الأعمدة: العنوان والوسوم أهم من الرابط والوصف
+FTS_WEIGHTS = [10.0, 3.0, 2.0, 5.0, 4.0, 1.0]
+MAX_TERMS = 8
+
+_available = {}
+
+
+def fts_schema(table='shortener_url', fts_table=FTS_TABLE):
+    """جدول FTS5 بمحتوى خارجي ومشغلات المزامنة؛ التحديث فقط عند تغيّر أعمدة النص"""
+    columns = ', '.join(FTS_COLUMNS)
+    new_values = ', '.join(f'new.{column}' for column in FTS_COLUMNS)
+    old_values = ', '.join(f'old.{column}' for column in FTS_COLUMNS)
+    delete_old = (
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+    )
+    insert_new = f'INSERT INTO {fts_table}(rowid, {columns}) VALUES (new.id, {new_values});'
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5({columns}, "
+        f"content='{table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f'CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN {insert_new} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN {delete_old} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {columns} ON {table} '
+        f'BEGIN {delete_old} {insert_new} END',
+    ]
+
+
+def _connection():
+    return connections[router.db_for_read(URL)]
+
+
+def fts_available(connection=None):
+    connection = connection or _connection()
+    key = (connection.alias, connection.settings_dict['NAME'])
+    if key not in _available:
+        _available[key] = (
+            connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _available[key]
+
+
+def ensure_index(connection):
+    """إعادة إنشاء المشغلات إن فُقدت (إعادة بناء الجدول في ترحيلات SQLite تحذفها) ثم إعادة الفهرسة"""
+    _available.clear()
+    if not fts_available(connection):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+            [f'{FTS_TABLE}_a%'],
+        )
+        if cursor.fetchone()[0] == 3:
+            return False
+        for statement in fts_schema():
+            cursor.execute(statement)
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return True
+
+
+def build_match(query):
+    """تحويل نص المستخدم إلى تعبير MATCH آمن: كل كلمة بادئة، وكلها مطلوبة"""
+    terms = re.findall(r'\w+', query or '')[:MAX_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_filter(query):
+    """شرط Q للبحث؛ FTS5 إن توفر وإلا LIKE على الحقول النصية"""
+    if fts_available():
+        match = build_match(query)
+        if not match:
+            return Q(pk__in=[])
+        return Q(pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]))
+    condition = Q()
+    for column in FTS_COLUMNS:
+        condition |= Q(**{f'{column}__icontains': query})
+    return condition
+
+
+def ranked_ids(query, user_id=None, limit=20, offset=0):
+    """معرفات الروابط المطابقة مرتبة حسب bm25"""
+    match = build_match(query)
+    if not match:
+        return []
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    sql = (
+        f'SELECT {FTS_TABLE}.rowid FROM {FTS_TABLE} JOIN shortener_url u ON u.id = {FTS_TABLE}.rowid '
+        f'WHERE {FTS_TABLE} MATCH %s'
+    )
+    params = [match]
+    if user_id is not None:
+        sql += ' AND u.user_id = %s'
+        params.append(user_id)
+    sql += f' ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s OFFSET %s'
+    params += [limit, offset]
+    with _connection().cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_urls(query, user=None, limit=20, offset=0):
+    """نتائج البحث ككائنات URL بالترتيب"""
+    queryset = URL.objects.defer('qr_code')
+    if not fts_available():
+        queryset = queryset.filter(search_filter(query))
+        if user is not None:
+            queryset = queryset.filter(user=user)
+        return list(queryset[offset:offset + limit])
+    ids = ranked_ids(query, user_id=user.pk if user is not None else None, limit=limit, offset=offset)
+    found = queryset.in_bulk(ids)
+    return [found[pk] for pk in ids if pk in found]
@@ -0,0 +1,91 @@
+from django.db import connections, router
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import apikeys, dashboard, db, domains, resolver, search, tags
+from .models import URL, APIKey, ClickAnalytics, Domain, LinkHealth, RedirectChange
+
+
+connection_created.connect(db.configure_connection)
+
+
+@receiver(post_save, sender=URL)
+@receiver(post_delete, sender=URL)
+def evict_redirect_cache(sender, instance, **kwargs):
+    resolver.evict([instance.short_code, instance.custom_alias], instance.domain_id)
+    short_code, custom_alias, domain_id = getattr(instance, '_loaded_codes', (None, None, None))
+    if (short_code, custom_alias, domain_id) != (instance.short_code, instance.custom_alias, instance.domain_id):
+        resolver.evict([short_code, custom_alias], domain_id)
+    instance._loaded_codes = (instance.short_code, instance.custom_alias, instance.domain_id)
+
+
+@receiver(post_save, sender=URL)
+@receiver(post_delete, sender=URL)
+def invalidate_dashboard(sender, instance, **kwargs):
+    dashboard.invalidate([instance.user_id])
+
+
+@receiver(post_save, sender=URL)
+@receiver(post_delete, sender=URL)
+def record_redirect_change(sender, instance, **kwargs):
+    RedirectChange.record([instance.pk])
+
+
+@receiver(post_save, sender=Domain)
+@receiver(post_delete, sender=Domain)
+def invalidate_domains(sender, instance, **kwargs):
+    domains.invalidate()
+
+
+@receiver(post_save, sender=Domain)
+@receiver(pre_delete, sender=Domain)
+def record_domain_links(sender, instance, **kwargs):
+    # روابط النطاق تتبع حالته في خرائط nginx والفهرس؛ قبل الحذف لأن SET_NULL يفصلها بعده
+    RedirectChange.record(URL.objects.filter(domain_id=instance.pk).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=URL)
+def move_click_owner(sender, instance, created=False, **kwargs):
+    # ClickAnalytics.user نسخة من مالك الرابط
+    if not created and hasattr(instance, '_loaded_user_id'):
+        if instance._loaded_user_id != instance.user_id:
+            ClickAnalytics.objects.filter(url_id=instance.pk).update(user_id=instance.user_id)
+        instance._loaded_user_id = instance.user_id
+
+
+@receiver(post_save, sender=URL)
+def sync_tags(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'tags' in update_fields:
+        tags.sync(instance)
+
+
+@receiver(post_save, sender=URL)
+def recheck_link_health(sender, instance, created=False, update_fields=None, **kwargs):
+    # الوجهة قد تكون تغيرت: فحص في الدورة التالية
+    if not created and (update_fields is None or 'original_url' in update_fields):
+        LinkHealth.objects.filter(url_id=instance.pk).update(next_check_at=timezone.now())
+
+
+@receiver(pre_delete, sender=URL)
+def release_tags(sender, instance, **kwargs):
+    tags.release(instance)
+
+
+@receiver(post_delete, sender=URL)
+def delete_click_analytics(sender, instance, **kwargs):
+    ClickAnalytics.objects.filter(url_id=instance.pk).delete()
+
+
+@receiver(post_save, sender=APIKey)
+@receiver(post_delete, sender=APIKey)
+def invalidate_api_keys(sender, instance, created=False, **kwargs):
+    if not created:
+        apikeys.invalidate()
+
+
+@receiver(post_migrate)
+def repair_search_index(sender, using, **kwargs):
+    if sender.name == 'shortener' and router.allow_migrate_model(using, URL):
+        search.ensure_index(connections[using])
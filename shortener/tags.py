@@ -0,0 +1,71 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import Tag, URLTag
+
+
+def tag_ids(user_id, names):
+    """معرفات وسوم المستخدم بالأسماء، مع إنشاء الناقص منها دفعة واحدة"""
+    names = set(names)
+    if not names:
+        return {}
+    found = dict(Tag.objects.filter(user_id=user_id, name__in=names).values_list('name', 'pk'))
+    missing = names - found.keys()
+    if missing:
+        Tag.objects.bulk_create([Tag(user_id=user_id, name=name) for name in missing], ignore_conflicts=True)
+        found.update(Tag.objects.filter(user_id=user_id, name__in=missing).values_list('name', 'pk'))
+    return found
+
+
+def _adjust_counts(deltas):
+    # استعلام UPDATE واحد لكل قيمة تغيير مختلفة
+    by_delta = {}
+    for tag_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(tag_id)
+    for delta, ids in by_delta.items():
+        Tag.objects.filter(pk__in=ids).update(url_count=F('url_count') + delta)
+
+
+def link(user_id, url_names):
+    """ربط روابط جديدة بوسومها: {url_id: [names]}"""
+    ids = tag_ids(user_id, {name for names in url_names.values() for name in names})
+    links = [URLTag(url_id=url_id, tag_id=ids[name]) for url_id, names in url_names.items() for name in names]
+    if not links:
+        return
+    with transaction.atomic():
+        URLTag.objects.bulk_create(links)
+        _adjust_counts(Counter(link.tag_id for link in links))
+
+
+def sync(url):
+    """مطابقة علاقات الوسوم مع نص URL.tags وتحديث العدادات بالفرق فقط"""
+    if url.user_id is None:
+        return
+    names = url.get_tags_list()
+    current = dict(URLTag.objects.filter(url=url).values_list('tag__name', 'tag_id'))
+    added = [name for name in names if name not in current]
+    removed = [tag_id for name, tag_id in current.items() if name not in names]
+    if not added and not removed:
+        return
+    with transaction.atomic():
+        if removed:
+            URLTag.objects.filter(url=url, tag_id__in=removed).delete()
+            _adjust_counts({tag_id: -1 for tag_id in removed})
+        if added:
+            link(url.user_id, {url.pk: added})
+
+
+def release(url):
+    """إنقاص عدادات وسوم رابط قبل حذفه؛ الصفوف نفسها تُحذف بالتتابع"""
+    Tag.objects.filter(url_links__url=url).update(url_count=F('url_count') - 1)
+
+
+def tag_cloud(user_id, limit=100):
+    return list(
+        Tag.objects.filter(user_id=user_id, url_count__gt=0)
+        .order_by('-url_count')
+        .values('name', 'url_count')[:limit]
+    )
@@ -1,3 +1,225 @@
-from django.test import TestCase
+import asyncio
+import os
+import runpy
+import threading
+from collections import defaultdict
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from aiohttp import web
+from django.conf import settings
+from django.core.checks import Error
+from django.core.management import call_command
+from django.core.management.base import SystemCheckError
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from shortener import linkhealth
+from shortener.checks import check_shared_cache
+from shortener.models import URL, LinkHealth
+
+
+class LinkServer:
+    """خادم aiohttp محلي في خيط منفصل؛ linkhealth.run يشغّل حلقته الخاصة عبر asyncio.run"""
+
+    def __init__(self):
+        self.in_flight = defaultdict(int)
+        self.max_in_flight = defaultdict(int)
+
+    async def ok(self, request):
+        return web.Response(text='ok')
+
+    async def slow(self, request):
+        await asyncio.sleep(0.3)
+        return web.Response(text='slow')
+
+    async def missing(self, request):
+        return web.Response(status=404)
+
+    async def moved(self, request):
+        raise web.HTTPFound('/ok')
+
+    async def hang(self, request):
+        await asyncio.sleep(1)
+        return web.Response(text='late')
+
+    async def busy(self, request):
+        # عدد الطلبات المتزامنة لكل مضيف كما يراه الخادم
+        host = request.host
+        self.in_flight[host] += 1
+        self.max_in_flight[host] = max(self.max_in_flight[host], self.in_flight[host])
+        try:
+            await asyncio.sleep(0.1)
+        finally:
+            self.in_flight[host] -= 1
+        return web.Response(text='busy')
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get('/ok', self.ok)
+        app.router.add_get('/slow', self.slow)
+        app.router.add_get('/missing', self.missing)
+        app.router.add_get('/moved', self.moved)
+        app.router.add_get('/hang', self.hang)
+        app.router.add_get('/busy/{n}', self.busy)
+        return app
+
+    def start(self):
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def serve():
+            asyncio.set_event_loop(self.loop)
+            self.runner = web.AppRunner(self.app())
+            self.loop.run_until_complete(self.runner.setup())
+            site = web.TCPSite(self.runner, '127.0.0.1', 0)
+            self.loop.run_until_complete(site.start())
+            self.port = self.runner.addresses[0][1]
+            started.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=serve, daemon=True)
+        self.thread.start()
+        started.wait(5)
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result(10)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+        self.loop.close()
+
+    def url(self, path):
+        return f'http://127.0.0.1:{self.port}{path}'
+
+
+@override_settings(LINK_HEALTH_RETRY=60)
+class LinkHealthTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = LinkServer()
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def link(self, path, click_count=0):
+        return URL.objects.create(original_url=self.server.url(path), click_count=click_count)
+
+    def run_checks(self, **options):
+        options = {'limit': 100, 'concurrency': 10, 'per_host': 10, 'rate': 0, 'timeout': 0.5, **options}
+        return linkhealth.run(**options)
+
+    def test_statuses_and_latency(self):
+        links = {name: self.link(path) for name, path in [
+            ('ok', '/ok'), ('slow', '/slow'), ('missing', '/missing'), ('moved', '/moved'), ('hang', '/hang'),
+        ]}
+
+        self.assertEqual(self.run_checks(), (5, 0))
+        health = {name: LinkHealth.objects.get(url=url) for name, url in links.items()}
+
+        self.assertEqual((health['ok'].status_code, health['ok'].ok, health['ok'].error), (200, True, ''))
+        self.assertGreater(health['ok'].latency_ms, 0)
+        self.assertEqual(health['slow'].status_code, 200)
+        self.assertGreaterEqual(health['slow'].latency_ms, 300)
+        self.assertLess(health['ok'].latency_ms, health['slow'].latency_ms)
+        # إعادة التوجيه تُتبع حتى الوجهة النهائية
+        self.assertEqual((health['moved'].status_code, health['moved'].ok), (200, True))
+        self.assertEqual((health['missing'].status_code, health['missing'].ok), (404, False))
+        self.assertEqual(health['missing'].failures, 1)
+        self.assertEqual((health['hang'].status_code, health['hang'].error), (None, 'timeout'))
+        self.assertGreaterEqual(health['hang'].latency_ms, 500)
+        self.assertFalse(health['missing'].is_broken)
+
+        # الفشل الثاني على التوالي يجعل الرابط معطلاً؛ النجاح يصفّر العداد
+        LinkHealth.objects.update(next_check_at=health['ok'].checked_at)
+        self.assertEqual(self.run_checks(), (5, 2))
+        broken = set(LinkHealth.objects.filter(failures__gte=LinkHealth.BROKEN_AFTER).values_list('url_id', flat=True))
+        self.assertEqual(broken, {links['missing'].pk, links['hang'].pk})
+        self.assertEqual(LinkHealth.objects.get(url=links['ok']).failures, 0)
+
+    def test_per_host_concurrency_cap(self):
+        for n in range(6):
+            self.link(f'/busy/{n}')
+
+        self.assertEqual(self.run_checks(concurrency=10, per_host=2), (6, 0))
+        # الحد العام 10، فالحد الفعلي هنا هو حد المضيف
+        self.assertEqual(dict(self.server.max_in_flight), {f'127.0.0.1:{self.server.port}': 2})
+
+    @override_settings(LINK_HEALTH_INTERVALS=[(1000, 3600), (100, 6 * 3600), (1, 24 * 3600), (0, 7 * 24 * 3600)])
+    def test_reschedule_by_click_volume(self):
+        expected = {
+            self.link('/ok', click_count=5000).pk: 3600,
+            self.link('/ok', click_count=500).pk: 6 * 3600,
+            self.link('/ok', click_count=5).pk: 24 * 3600,
+            self.link('/ok', click_count=0).pk: 7 * 24 * 3600,
+            # الرابط الفاشل يُعاد فحصه بعد LINK_HEALTH_RETRY مهما كان عدد نقراته
+            self.link('/missing', click_count=0).pk: 60,
+        }
+
+        self.assertEqual(self.run_checks(), (5, 0))
+        for url_id, checked_at, next_check_at in LinkHealth.objects.values_list('url_id', 'checked_at', 'next_check_at'):
+            interval = (next_check_at - checked_at).total_seconds()
+            # تشتيت ±10% حول المدة
+            self.assertGreaterEqual(interval, expected[url_id] * 0.9)
+            self.assertLessEqual(interval, expected[url_id] * 1.1)
+
+        # لا شيء مستحق قبل موعده
+        self.assertEqual(self.run_checks(), (0, 0))
+
+
+def cache_settings(backend):
+    return {'default': {'BACKEND': f'django.core.cache.backends.{backend}', 'LOCATION': 'urlshortener-tests'}}
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    @override_settings(CACHES=cache_settings('locmem.LocMemCache'))
+    def test_deploy_check_rejects_locmem(self):
+        with self.assertRaisesMessage(SystemCheckError, 'shortener.E001'):
+            call_command('check', deploy=True, tags=['caches'])
+
+    @override_settings(CACHES=cache_settings('dummy.DummyCache'))
+    def test_deploy_check_rejects_dummy(self):
+        errors = check_shared_cache(None)
+        self.assertEqual([(type(error), error.id) for error in errors], [(Error, 'shortener.E001')])
+
+    @override_settings(CACHES=cache_settings('db.DatabaseCache'))
+    def test_shared_cache_passes(self):
+        self.assertEqual(check_shared_cache(None), [])
+        call_command('check', deploy=True, tags=['caches'])
+
+    @override_settings(CACHES=cache_settings('locmem.LocMemCache'))
+    def test_plain_check_ignores_locmem(self):
+        # فحص التطوير العادي لا يشترط كاشاً مشتركاً
+        call_command('check', tags=['caches'])
+
+
+class GunicornConfigTests(SimpleTestCase):
+    def load_config(self, **env):
+        with mock.patch.dict(os.environ, env):
+            for name in ('CACHE_BACKEND', 'WEB_CONCURRENCY'):
+                if name not in env:
+                    os.environ.pop(name, None)
+            return runpy.run_path(os.path.join(settings.BASE_DIR, 'gunicorn.conf.py'))
+
+    def start(self, config):
+        config['on_starting'](SimpleNamespace(cfg=SimpleNamespace(workers=config['workers'])))
+
+    @override_settings(CACHES=cache_settings('locmem.LocMemCache'))
+    def test_default_config_boots_one_worker(self):
+        config = self.load_config()
+        self.assertEqual(config['workers'], 1)
+        self.start(config)
+
+    @override_settings(CACHES=cache_settings('locmem.LocMemCache'))
+    def test_several_workers_on_locmem_refuse_to_start(self):
+        config = self.load_config(WEB_CONCURRENCY='3')
+        with self.assertRaisesMessage(RuntimeError, 'not shared between processes'):
+            self.start(config)
+
+    @override_settings(CACHES=cache_settings('db.DatabaseCache'))
+    def test_shared_cache_enables_several_workers(self):
+        config = self.load_config(CACHE_BACKEND='django.core.cache.backends.db.DatabaseCache')
+        self.assertGreater(config['workers'], 1)
+        self.start(config)
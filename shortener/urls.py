@@ -4,13 +4,24 @@ from . import views
 urlpatterns = [
     path('index/', views.index, name='index'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('export/urls/', views.export_urls, name='export_urls'),
+    path('export/clicks/', views.export_clicks, name='export_clicks'),
+    path('reports/monthly/', views.monthly_report, name='monthly_report'),
+    path('search/', views.search_urls, name='search_urls'),
+    path('import/', views.import_links, name='import_links'),
+    path('api/links/', views.api_links, name='api_links'),
+    path('api/links/<str:code>/clicks/', views.api_link_clicks, name='api_link_clicks'),
+    path('tags/', views.tag_cloud, name='tag_cloud'),
+    path('tags/<str:name>/', views.tag_links, name='tag_links'),
     path('advanced_shorten', views.advanced_shorten, name='api_shorten'),
   
     path('url_analytics/<str:short_code>', views.url_analytics, name='url_analytics'),
+    path('qr/<int:url_id>/', views.url_qr_code, name='url_qr_code'),
     path('', views.Comming_Soon_Page, name='coming_soon'),
     path('advanced_shorten', views.advanced_shorten, name='advanced_shorten'),
     path('api/shorten/', views.api_shorten, name='api_shorten'),
     path('stats/<str:short_code>/', views.url_stats, name='url_stats'),
+    path('metrics/', views.metrics_view, name='metrics'),
     path('<str:short_code>/', views.redirect_url, name='redirect_url'),
     path('login/', views.login, name='login'),
     path('logout/', views.logout, name='logout'), 
@@ -1,23 +1,26 @@
-import requests
-from bs4 import BeautifulSoup
-from django.core.mail import send_mail
 from django.conf import settings
-import geoip2.database
-import geoip2.errors
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
 import csv
-from django.http import HttpResponse
+import zlib
+from django.http import FileResponse, StreamingHttpResponse
 from django.utils import timezone
 from django.db.models import Count
 from datetime import timedelta
+from functools import lru_cache
+from shortener import metrics
+from shortener.instrumentation import record_cache, timed
 
 def extract_url_info(url):
     """استخراج معلومات الصفحة من الرابط"""
+    # استيراد كسول: هذه المكتبات ثقيلة ولا يحتاجها مسار إعادة التوجيه
+    import requests
+    from bs4 import BeautifulSoup
+
     try:
-        response = requests.get(url, timeout=10, headers={
-            'User-Agent': 'Mozilla/5.0 (compatible; UrlPro/1.0)'
-        })
+        with timed('metadata'):
+            response = requests.get(url, timeout=10, headers={
+                'User-Agent': 'Mozilla/5.0 (compatible; UrlPro/1.0)'
+            })
+        metrics.METADATA_FETCHES.inc(outcome='ok' if response.status_code < 400 else 'http_error')
         soup = BeautifulSoup(response.content, 'html.parser')
         
         title = soup.find('title')
@@ -32,13 +35,23 @@ def extract_url_info(url):
             'status_code': response.status_code
         }
     except:
+        metrics.METADATA_FETCHES.inc(outcome='error')
         return {'title': '', 'description': '', 'status_code': 0}
 
 def get_location_from_ip(ip_address):
     """الحصول على الموقع الجغرافي من IP"""
+    hits = _lookup_location.cache_info().hits
+    location = _lookup_location(ip_address)
+    record_cache('geoip', _lookup_location.cache_info().hits > hits)
+    return dict(location)
+
+@lru_cache(maxsize=10000)
+def _lookup_location(ip_address):
+    import geoip2.database
+
     try:
         # يمكنك تحميل قاعدة بيانات GeoLite2 مجاناً من MaxMind
-        with geoip2.database.Reader('path/to/GeoLite2-City.mmdb') as reader:
+        with timed('geoip'), geoip2.database.Reader('path/to/GeoLite2-City.mmdb') as reader:
             response = reader.city(ip_address)
             return {
                 'country': response.country.names.get('ar', response.country.name),
@@ -47,120 +60,112 @@ def get_location_from_ip(ip_address):
     except:
         return {'country': 'غير معروف', 'city': 'غير معروف'}
 
-def generate_csv_export(user):
-    """تصدير بيانات المستخدم إلى CSV"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="urls_export.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['الرابط الأصلي', 'الرابط المختصر', 'العنوان', 'النقرات', 'تاريخ الإنشاء'])
-    
-    for url in user.url_set.all():
-        writer.writerow([
-            url.original_url,
-            url.get_short_url(),
-            url.title,
-            url.click_count,
-            url.created_at.strftime('%Y-%m-%d %H:%M')
-        ])
-    
+def parse_user_agent(user_agent_string):
+    """تحليل User-Agent مع كاش للقيم المتكررة"""
+    hits = _parse_user_agent.cache_info().hits
+    user_agent = _parse_user_agent(user_agent_string)
+    record_cache('user_agent', _parse_user_agent.cache_info().hits > hits)
+    return user_agent
+
+@lru_cache(maxsize=5000)
+def _parse_user_agent(user_agent_string):
+    from user_agents import parse as parse_ua
+
+    return parse_ua(user_agent_string)
+
+class Echo:
+    """كائن بديل للملف: يعيد السطر بدلاً من كتابته (للتصدير المتدفق)"""
+
+    def write(self, value):
+        return value
+
+def batch_chunks(chunks, size=64 * 1024):
+    """تجميع الأسطر الصغيرة في كتل بحجم مناسب للإرسال"""
+    buffer = []
+    buffered = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield ''.join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield ''.join(buffer)
+
+def gzip_stream(chunks):
+    """ضغط تدفق نصي بصيغة gzip أثناء الإرسال"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def generate_csv_export(user, compress=False):
+    """تصدير بيانات المستخدم إلى CSV (متدفق)"""
+    from .models import URL
+    urls = URL.objects.filter(user=user).only(
+        'original_url', 'short_code', 'custom_alias', 'title',
+        'click_count', 'created_at', 'domain_id',
+    ).order_by('pk')
+    writer = csv.writer(Echo())
+
+    def rows():
+        yield writer.writerow(['الرابط الأصلي', 'الرابط المختصر', 'العنوان', 'النقرات', 'تاريخ الإنشاء'])
+        for url in urls.iterator(chunk_size=2000):
+            yield writer.writerow([
+                url.original_url,
+                url.get_short_url(),
+                url.title,
+                url.click_count,
+                url.created_at.strftime('%Y-%m-%d %H:%M')
+            ])
+
+    if compress:
+        response = StreamingHttpResponse(gzip_stream(batch_chunks(rows())), content_type='application/gzip')
+        response['Content-Disposition'] = 'attachment; filename="urls_export.csv.gz"'
+    else:
+        response = StreamingHttpResponse(batch_chunks(rows()), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="urls_export.csv"'
     return response
 
-def generate_pdf_report(user):
-    """إنشاء تقرير PDF للمستخدم"""
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="monthly_report.pdf"'
-    
-    p = canvas.Canvas(response, pagesize=letter)
-    
-    # عنوان التقرير
-    p.drawString(100, 750, f"تقرير شهري للمستخدم: {user.username}")
-    
-    # الإحصائيات
-    y_position = 700
-    urls = user.url_set.all()
-    total_urls = urls.count()
-    total_clicks = sum(urls.values_list('click_count', flat=True))
-    
-    p.drawString(100, y_position, f"إجمالي الروابط: {total_urls}")
-    p.drawString(100, y_position-20, f"إجمالي النقرات: {total_clicks}")
-    
-    # قائمة الروابط
-    y_position -= 60
-    p.drawString(100, y_position, "قائمة الروابط:")
-    y_position -= 20
-    
-    for url in urls[:20]:  # أول 20 رابط
-        p.drawString(120, y_position, f"• {url.title or url.original_url[:50]}...")
-        p.drawString(400, y_position, f"{url.click_count} نقرة")
-        y_position -= 15
-        
-        if y_position < 100:
-            break
-    
-    p.showPage()
-    p.save()
+def generate_pdf_report(user, period=None):
+    """إنشاء تقرير PDF للمستخدم (يُقدَّم من الكاش إن لم تتغير البيانات)"""
+    from .reports import build_report, current_period
+    period = period or current_period()
+    response = FileResponse(open(build_report(user, period), 'rb'), content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="report_{period}.pdf"'
     return response
 
 def send_weekly_report(user):
     """إرسال تقرير أسبوعي بالبريد الإلكتروني"""
+    from .digest import build_weekly_message, weekly_stats
     if not user.userprofile.weekly_reports:
         return
     
-    urls = user.url_set.all()
-    total_clicks_week = sum(
-        url.analytics.filter(
-            clicked_at__gte=timezone.now() - timedelta(days=7)
-        ).count() for url in urls
-    )
-    
-    subject = f'تقريرك الأسبوعي - UrlPro'
-    message = f'''
-    مرحباً {user.username}،
-    
-    إليك تقريرك الأسبوعي:
-    
-    📊 إجمالي النقرات هذا الأسبوع: {total_clicks_week}
-    🔗 إجمالي الروابط النشطة: {urls.filter(is_active=True).count()}
-    
-    يمكنك مراجعة التفاصيل الكاملة في لوحة التحكم.
-    
-    تحياتنا،
-    فريق UrlPro
-    '''
-    
-    send_mail(
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,
-        [user.email],
-        fail_silently=True,
-    )
+    weekly_clicks, active_links = weekly_stats(user_ids=[user.pk])
+    build_weekly_message(user, weekly_clicks, active_links).send(fail_silently=True)
 
 class RateLimiter:
     """نظام تحديد المعدل للAPI"""
     
     @staticmethod
     def check_rate_limit(user_profile, limit_type='api'):
+        from .ratelimit import check_api_key
         if limit_type == 'api':
-            if user_profile.api_calls_count >= user_profile.api_calls_limit:
-                return False
-            user_profile.api_calls_count += 1
-            user_profile.save()
+            return check_api_key(
+                user_profile.pk,
+                user_profile.api_calls_limit,
+                user_profile.api_calls_count,
+                user_profile.api_calls_period,
+            ).allowed
         return True
 
 def clean_expired_urls():
     """تنظيف الروابط المنتهية الصلاحية"""
-    from .models import URL
-    expired_urls = URL.objects.filter(
-        expires_at__lt=timezone.now(),
-        is_active=True
-    )
-    
-    count = expired_urls.count()
-    expired_urls.update(is_active=False)
-    
-    return count
+    from .expiry import expire_due_urls
+    return expire_due_urls()
 
 def generate_analytics_data(url_obj, days=30):
     """إنشاء بيانات التحليلات لرابط معين"""
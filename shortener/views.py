@@ -3,18 +3,27 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import (
+    FileResponse, Http404, JsonResponse, HttpResponse, HttpResponsePermanentRedirect, HttpResponseRedirect, StreamingHttpResponse,
+)
+from django.utils.cache import patch_cache_control
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
-from django.db.models import Count, Q
-from django.core.paginator import Paginator
+from django.db.models import Count, F, Q
 from django.templatetags.static import static
-from user_agents import parse
+from django.conf import settings
+import base64
 import json
-import requests
 from datetime import datetime, timedelta
-from .models import URL, ClickAnalytics, UserProfile, Notification, URLCategory
-from shortener.utils import get_location_from_ip, extract_url_info, generate_pdf_report
+from .models import URL, ClickAnalytics, UserProfile, Notification, URLCategory, Tag
+from shortener.utils import (
+    get_location_from_ip, extract_url_info, parse_user_agent, generate_csv_export,
+)
+from shortener import apikeys, domains, importer, metrics, pagination, ratelimit, reports, search
+from shortener import tags as url_tags
+from shortener import dashboard as dashboard_data
+from shortener.resolver import resolve
+from shortener.exports import InvalidCursor, click_export_stream, clicks_for, decode_cursor, parse_bound
 
 def index(request):
     """الصفحة الرئيسية مع الإحصائيات"""
@@ -42,45 +51,261 @@ def index(request):
 @login_required
 def dashboard(request):
     """لوحة تحكم المستخدم"""
-    user_urls = URL.objects.filter(user=request.user)
-    
-    # إحصائيات المستخدم
-    stats = {
-        'total_urls': user_urls.count(),
-        'total_clicks': sum(user_urls.values_list('click_count', flat=True)),
-        'active_urls': user_urls.filter(is_active=True).count(),
-        'expired_urls': user_urls.filter(expires_at__lt=timezone.now()).count(),
-    }
-    
-    # الروابط الأخيرة
-    recent_urls = user_urls[:10]
-    
-    # بيانات الرسم البياني (آخر 30 يوم)
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    daily_clicks = []
-    
-    for i in range(30):
-        date = thirty_days_ago + timedelta(days=i)
-        clicks = ClickAnalytics.objects.filter(
-            url__user=request.user,
-            clicked_at__date=date.date()
-        ).count()
-        daily_clicks.append({
-            'date': date.strftime('%Y-%m-%d'),
-            'clicks': clicks
-        })
+    # الإحصائيات والرسم البياني من الكاش؛ الإشعارات غير المقروءة دائماً مباشرة
+    data = dashboard_data.get(request.user.pk)
     
     # الإشعارات
-    notifications = Notification.objects.filter(user=request.user, is_read=False)[:5]
+    notifications = dashboard_data.unread_notifications(request.user.pk)
     
     context = {
-        'stats': stats,
-        'recent_urls': recent_urls,
-        'daily_clicks': json.dumps(daily_clicks),
+        'stats': data['stats'],
+        'recent_urls': dashboard_data.present_links(data['recent_urls']),
+        'daily_clicks': json.dumps(data['daily_clicks']),
         'notifications': notifications,
     }
     return render(request, 'shortener/dashboard.html', context)
 
+@login_required
+def export_urls(request):
+    """تصدير روابط المستخدم إلى CSV"""
+    return generate_csv_export(request.user, compress=request.GET.get('gzip') == '1')
+
+@login_required
+def export_clicks(request):
+    """تصدير النقرات الخام (NDJSON أو CSV) لرابط أو للمستخدم أو للجميع"""
+    scope = request.GET.get('scope', 'user')
+    fmt = 'csv' if request.GET.get('format') == 'csv' else 'ndjson'
+    compress = request.GET.get('gzip') == '1'
+    cursor = request.GET.get('cursor') or None
+
+    if scope == 'url':
+        url_obj = _owned_link(request, request.GET.get('code'))
+        queryset = clicks_for(url=url_obj)
+    elif scope == 'all':
+        if not request.user.is_staff:
+            return JsonResponse({'error': 'Forbidden'}, status=403)
+        queryset = clicks_for()
+    else:
+        queryset = clicks_for(user=request.user)
+
+    try:
+        start = parse_bound(request.GET.get('start'))
+        end = parse_bound(request.GET.get('end'), end=True)
+        if cursor:
+            decode_cursor(cursor)
+    except (ValueError, InvalidCursor):
+        return JsonResponse({'error': 'Invalid date range or cursor'}, status=400)
+
+    stream = click_export_stream(queryset, fmt=fmt, start=start, end=end, cursor=cursor, compress=compress)
+    filename = f'clicks.{fmt}' + ('.gz' if compress else '')
+    content_type = 'application/gzip' if compress else ('text/csv' if fmt == 'csv' else 'application/x-ndjson')
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@login_required
+def url_qr_code(request, url_id):
+    """صورة رمز QR لرابط المستخدم؛ تُولَّد عند أول طلب للروابط المستوردة"""
+    url_obj = get_object_or_404(
+        URL.objects.only('id', 'short_code', 'custom_alias', 'domain_id', 'qr_code'),
+        pk=url_id, user=request.user,
+    )
+    response = HttpResponse(base64.b64decode(url_obj.ensure_qr_code()), content_type='image/png')
+    patch_cache_control(response, private=True, max_age=3600)
+    return response
+
+@login_required
+def monthly_report(request):
+    """تنزيل التقرير الشهري؛ يُبنى في الخلفية عند الحاجة"""
+    period = request.GET.get('period') or reports.current_period()
+    try:
+        reports.period_bounds(period)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid period'}, status=400)
+
+    path = reports.cached_report(request.user, period)
+    try:
+        # النسخة الجاهزة كما هي؛ قد تحذفها إعادة بناء متزامنة بعد فحصها
+        fh = open(path, 'rb') if path else None
+    except FileNotFoundError:
+        fh = None
+    if fh is None:
+        reports.request_report(request.user, period)
+        return JsonResponse({'status': 'pending', 'period': period}, status=202)
+    response = FileResponse(fh, content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="report_{period}.pdf"'
+    return response
+
+@login_required
+def search_urls(request):
+    """البحث في روابط المستخدم مرتبة حسب الصلة"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 50)
+        offset = max(int(request.GET.get('offset', 0)), 0)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid limit or offset'}, status=400)
+    if not query:
+        return JsonResponse({'query': query, 'results': []})
+
+    results = search.search_urls(query, user=request.user, limit=limit, offset=offset)
+    return JsonResponse({
+        'query': query,
+        'results': [
+            {
+                'short_code': url.short_code,
+                'short_url': url.get_short_url(),
+                'original_url': url.original_url,
+                'title': url.title,
+                'tags': url.tags,
+                'click_count': url.click_count,
+            }
+            for url in results
+        ],
+    })
+
+def _owned_link(request, code, queryset=URL.objects):
+    """رابط المستخدم بالرمز، أو بالاسم المخصص داخل نطاق ?domain= أو مضيف الطلب؛ 404 إن لم يوجد"""
+    # بدون ترتيب: كل بحث أدناه على قيد فريد فلا حاجة لفرز مؤقت
+    links = queryset.filter(user=request.user).order_by()
+    # short_code فريد على كل النطاقات، أما الاسم المخصص ففريد داخل نطاقه فقط
+    rows = links.filter(short_code=code)[:1]
+    if not rows:
+        try:
+            domain_id = domains.for_host(request.GET.get('domain') or request.get_host())
+        except domains.InactiveDomain:
+            raise Http404
+        rows = links.filter(custom_alias=code, domain_id=domain_id)[:1]
+    if not rows:
+        raise Http404
+    return rows[0]
+
+def _page_params(request):
+    limit = min(max(int(request.GET.get('limit', 20)), 1), 100)
+    return request.GET.get('cursor') or None, limit
+
+@login_required
+def api_links(request):
+    """روابط المستخدم، الأحدث أولاً، بترقيم بمؤشر على (created_at, id)"""
+    try:
+        cursor, limit = _page_params(request)
+        links, next_cursor = pagination.keyset_page(
+            pagination.user_links(request.user.pk), 'created_at', cursor, limit
+        )
+    except (ValueError, InvalidCursor):
+        return JsonResponse({'error': 'Invalid limit or cursor'}, status=400)
+    return JsonResponse({
+        'results': [
+            {
+                'short_code': url.short_code,
+                'custom_alias': url.custom_alias,
+                'short_url': url.get_short_url(),
+                'original_url': url.original_url,
+                'title': url.title,
+                'tags': url.get_tags_list(),
+                'created_at': url.created_at.isoformat(),
+                'expires_at': url.expires_at.isoformat() if url.expires_at else None,
+                'click_count': url.click_count,
+                'unique_clicks': url.unique_clicks,
+                'last_clicked': url.last_clicked.isoformat() if url.last_clicked else None,
+                'is_active': url.is_active,
+                'is_private': url.is_private,
+                'redirect_policy': url.redirect_policy,
+            }
+            for url in links
+        ],
+        'next': next_cursor,
+    })
+
+@login_required
+def api_link_clicks(request, code):
+    """نقرات رابط للمستخدم، الأحدث أولاً، بترقيم بمؤشر على (clicked_at, id)"""
+    url_obj = _owned_link(request, code, URL.objects.only('id'))
+    try:
+        cursor, limit = _page_params(request)
+        clicks, next_cursor = pagination.keyset_page(pagination.link_clicks(url_obj), 'clicked_at', cursor, limit)
+    except (ValueError, InvalidCursor):
+        return JsonResponse({'error': 'Invalid limit or cursor'}, status=400)
+    return JsonResponse({
+        'results': [
+            {
+                'clicked_at': click.clicked_at.isoformat(),
+                'country': click.country,
+                'city': click.city,
+                'device_type': click.device_type,
+                'browser': click.browser,
+                'os': click.os,
+                'referer': click.referer,
+                'is_unique': click.is_unique,
+            }
+            for click in clicks
+        ],
+        'next': next_cursor,
+    })
+
+@login_required
+def import_links(request):
+    """رفع ملف CSV أو NDJSON لاستيراد الروابط؛ الملفات الكبيرة تُستكمل بإعادة الرفع مع start_after"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'error': 'file is required'}, status=400)
+    fmt = request.POST.get('format') or importer.detect_format(upload.name)
+    if fmt not in importer.FORMATS:
+        return JsonResponse({'error': 'Invalid format'}, status=400)
+    try:
+        start_after = max(int(request.POST.get('start_after') or 0), 0)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid start_after'}, status=400)
+    result = importer.import_links(
+        upload, fmt, request.user.pk, start_after=start_after, limit=settings.IMPORT_UPLOAD_MAX_ROWS
+    )
+    return JsonResponse(result.as_dict())
+
+@login_required
+def tag_cloud(request):
+    """وسوم المستخدم مع عدد الروابط لكل وسم"""
+    return JsonResponse({
+        'tags': [{'name': tag['name'], 'count': tag['url_count']} for tag in url_tags.tag_cloud(request.user.pk)],
+    })
+
+@login_required
+def tag_links(request, name):
+    """روابط المستخدم ذات الوسم، الأحدث أولاً، مع ترقيم بالمعرف"""
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 100)
+        before = int(request.GET['before']) if request.GET.get('before') else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid limit or before'}, status=400)
+
+    tag = Tag.objects.filter(user=request.user, name=name.lower()).values_list('pk', flat=True).first()
+    if tag is None:
+        return JsonResponse({'tag': name, 'results': [], 'next': None})
+    # الترتيب والترقيم على urltag.url_id ليخدمهما فهرس (tag, url) دون فرز
+    condition = Q(tag_links__tag_id=tag)
+    if before is not None:
+        condition &= Q(tag_links__url_id__lt=before)
+    links = list(
+        URL.objects.filter(condition).defer('qr_code')
+        .order_by('-tag_links__url_id')[:limit]
+    )
+    return JsonResponse({
+        'tag': name,
+        'results': [
+            {
+                'id': url.pk,
+                'short_code': url.short_code,
+                'short_url': url.get_short_url(),
+                'original_url': url.original_url,
+                'title': url.title,
+                'click_count': url.click_count,
+            }
+            for url in links
+        ],
+        'next': links[-1].pk if len(links) == limit else None,
+    })
+
 def advanced_shorten(request):
     """صفحة الاختصار المتقدم"""
     if request.method == 'POST':
@@ -104,7 +329,7 @@ def advanced_shorten(request):
         
         # التحقق من الرمز المخصص
         if custom_alias:
-            if URL.objects.filter(custom_alias=custom_alias).exists():
+            if URL.objects.filter(custom_alias=custom_alias, domain__isnull=True).exists():
                 messages.error(request, 'الرمز المخصص مستخدم بالفعل')
                 return redirect('advanced_shorten')
         
@@ -173,7 +398,7 @@ def redirect_url(request, short_code):
             return render(request, 'shortener/password_required.html', {'url': url_obj})
     
     # جمع بيانات التحليل
-    user_agent = parse(request.META.get('HTTP_USER_AGENT', ''))
+    user_agent = parse_user_agent(request.META.get('HTTP_USER_AGENT', ''))
     ip_address = get_client_ip(request)
     
     # التحقق من النقرة الفريدة
@@ -209,11 +434,8 @@ def redirect_url(request, short_code):
 @login_required
 def url_analytics(request, short_code):
     """صفحة التحليلات المتقدمة"""
-    url_obj = get_object_or_404(
-        URL, 
-        Q(short_code=short_code) | Q(custom_alias=short_code),
-        user=request.user
-    )
+    url_obj = _owned_link(request, short_code)
+    url_obj.ensure_qr_code()
     
     analytics = url_obj.analytics.all()
     
@@ -253,42 +475,47 @@ def api_shorten(request):
         try:
             # التحقق من API key
             api_key = request.headers.get('X-API-Key')
-            user = None
+            user_id = None
             
             if api_key:
-                try:
-                    profile = UserProfile.objects.get(api_key=api_key)
-                    user = profile.user
-                    
-                    # التحقق من حد الاستخدام
-                    if profile.api_calls_count >= profile.api_calls_limit:
-                        return JsonResponse({
-                            'error': 'API limit exceeded'
-                        }, status=429)
-                    
-                    profile.api_calls_count += 1
-                    profile.save()
-                    
-                except UserProfile.DoesNotExist:
+                identity = apikeys.authenticate(api_key)
+                if identity is None:
                     return JsonResponse({
                         'error': 'Invalid API key'
                     }, status=401)
+                user_id = identity.user_id
+                
+                # التحقق من حد الاستخدام
+                limit = ratelimit.check_api_key(
+                    identity.profile_id, identity.calls_limit, identity.calls_count, identity.calls_period
+                )
+            else:
+                limit = ratelimit.check_anonymous(get_client_ip(request))
+            
+            if not limit.allowed:
+                return ratelimit.apply_headers(JsonResponse({
+                    'error': 'API limit exceeded'
+                }, status=429), limit)
             
             data = json.loads(request.body)
             original_url = data.get('url')
             
             if not original_url:
                 return JsonResponse({'error': 'URL is required'}, status=400)
+            redirect_policy = data.get('redirect_policy', URL.POLICY_TRACKED)
+            if redirect_policy not in dict(URL.REDIRECT_POLICIES):
+                return JsonResponse({'error': 'Invalid redirect_policy'}, status=400)
             
             # إنشاء الرابط
             url_obj = URL.objects.create(
                 original_url=original_url,
-                user=user,
+                user_id=user_id,
                 custom_alias=data.get('custom_alias'),
                 title=data.get('title', ''),
                 description=data.get('description', ''),
                 password=data.get('password', ''),
-                is_private=data.get('is_private', False)
+                is_private=data.get('is_private', False),
+                redirect_policy=redirect_policy
             )
             
             # تاريخ الانتهاء
@@ -296,27 +523,38 @@ def api_shorten(request):
                 url_obj.expires_at = timezone.now() + timedelta(days=int(data.get('expires_days')))
                 url_obj.save()
             
-            return JsonResponse({
+            return ratelimit.apply_headers(JsonResponse({
                 'short_url': url_obj.get_short_url(),
                 'short_code': url_obj.short_code,
                 'original_url': url_obj.original_url,
                 'qr_code': url_obj.qr_code,
                 'created_at': url_obj.created_at.isoformat(),
-            })
+            }), limit)
             
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
     
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
+def metrics_view(request):
+    """نقطة عرض المقاييس بصيغة Prometheus"""
+    if not metrics.enabled():
+        return HttpResponse(status=404)
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse(status=403)
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # Utility Functions
 def get_client_ip(request):
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-    return ip
+    """عنوان العميل كما رآه أبعد وكيل موثوق؛ ما قبله في X-Forwarded-For يكتبه العميل نفسه"""
+    proxies = settings.TRUSTED_PROXY_COUNT
+    if proxies:
+        # كل وكيل موثوق يضيف عنوان من اتصل به في آخر القائمة
+        hops = [hop.strip() for hop in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+        if len(hops) >= proxies:
+            return hops[-proxies]
+    return request.META.get('REMOTE_ADDR')
 
 def get_device_type(user_agent):
     if user_agent.is_mobile:
@@ -380,6 +618,9 @@ def advanced_shorten(request):
         description = request.POST.get('description', '').strip()
         tags = request.POST.get('tags', '').strip()
         is_private = request.POST.get('is_private') == 'on'
+        redirect_policy = request.POST.get('redirect_policy', URL.POLICY_TRACKED)
+        if redirect_policy not in dict(URL.REDIRECT_POLICIES):
+            redirect_policy = URL.POLICY_TRACKED
         
         if not original_url:
             messages.error(request, 'يرجى إدخال رابط صحيح')
@@ -391,7 +632,7 @@ def advanced_shorten(request):
         
         # التحقق من الرمز المخصص
         if custom_alias:
-            if URL.objects.filter(custom_alias=custom_alias).exists():
+            if URL.objects.filter(custom_alias=custom_alias, domain__isnull=True).exists():
                 messages.error(request, 'الرمز المخصص مستخدم بالفعل')
                 return redirect('advanced_shorten')
         
@@ -412,6 +653,7 @@ def advanced_shorten(request):
             description=description,
             tags=tags,
             is_private=is_private,
+            redirect_policy=redirect_policy,
             category_id=category_id if category_id else None
         )
         
@@ -490,10 +732,39 @@ def shorten_url(request):
      
 def redirect_url(request, short_code):
     """Redirect to original URL and increment click count"""
-    url_obj = get_object_or_404(URL, short_code=short_code)
-    url_obj.click_count += 1
-    url_obj.save()
-    return redirect(url_obj.original_url)
+    try:
+        domain_id = domains.for_host(request.get_host())
+    except domains.InactiveDomain:
+        raise Http404
+    entry = resolve(short_code, domain_id)
+    if entry is None:
+        raise Http404
+    URL.objects.filter(pk=entry['id']).update(
+        click_count=F('click_count') + 1,
+        last_clicked=timezone.now()
+    )
+    return redirect_response(entry)
+
+def redirect_response(entry):
+    """استجابة إعادة التوجيه حسب سياسة الرابط وترويسات Cache-Control المناسبة"""
+    # مدخلات الكاش القديمة قد لا تحمل السياسة؛ الافتراض هو التتبع
+    policy = entry.get('policy', URL.POLICY_TRACKED)
+    if policy == URL.POLICY_TRACKED or entry.get('protected', True):
+        response = HttpResponseRedirect(entry['url'])
+        patch_cache_control(response, private=True, no_store=True)
+        return response
+
+    if policy == URL.POLICY_PERMANENT:
+        response = HttpResponsePermanentRedirect(entry['url'])
+        response.status_code = settings.REDIRECT_PERMANENT_STATUS
+        max_age = settings.REDIRECT_PERMANENT_MAX_AGE
+    else:
+        response = HttpResponseRedirect(entry['url'])
+        max_age = settings.REDIRECT_TEMPORARY_MAX_AGE
+    if entry['expires_at'] is not None:
+        max_age = max(0, min(max_age, int((entry['expires_at'] - timezone.now()).total_seconds())))
+    patch_cache_control(response, public=True, max_age=max_age)
+    return response
 
 def url_stats(request, short_code):
     """Show statistics for a shortened URL"""
@@ -0,0 +1,50 @@
+import logging
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import domains, metrics, resolver, utils
+from .models import ClickAnalytics
+
+logger = logging.getLogger(__name__)
+
+
+def _recent_values(since, sample):
+    # أحدث النقرات فقط عبر click_time_idx بترتيبه؛ لا GROUP BY على أعمدة غير مفهرسة عند الإقلاع
+    return list(
+        ClickAnalytics.objects.filter(clicked_at__gte=since).order_by('-clicked_at')
+        .values_list('user_agent', 'ip_address')[:sample]
+    )
+
+
+def _frequent(values, limit):
+    return [value for value, _ in Counter(value for value in values if value).most_common(limit)]
+
+
+def run(links=None, agents=None, addresses=None):
+    """تسخين الكاش قبل استقبال الطلبات: أكثر الروابط، وقيم UA و GeoIP الشائعة"""
+    started = time.monotonic()
+    links = settings.WARMUP_LINKS if links is None else links
+    agents = settings.WARMUP_USER_AGENTS if agents is None else agents
+    addresses = settings.WARMUP_IP_ADDRESSES if addresses is None else addresses
+    since = timezone.now() - timedelta(days=1)
+
+    domain_count = domains.prime()
+    primed = resolver.prime(links) if links else 0
+    rows = _recent_values(since, settings.WARMUP_SAMPLE_CLICKS) if agents or addresses else []
+    user_agents = _frequent((user_agent for user_agent, _ in rows), agents) if agents else []
+    ip_addresses = _frequent((ip_address for _, ip_address in rows), addresses) if addresses else []
+    # الدوال الداخلية مباشرة، ودون مقاييس: زمن GeoIP عند الإقلاع ليس زمن طلبات حقيقية
+    with metrics.suppressed():
+        for user_agent in user_agents:
+            utils._parse_user_agent(user_agent)
+        for ip_address in ip_addresses:
+            utils._lookup_location(ip_address)
+
+    logger.info(
+        'Warm-up primed %d domains, %d links, %d user agents and %d IP addresses in %.2fs',
+        domain_count, primed, len(user_agents), len(ip_addresses), time.monotonic() - started,
+    )
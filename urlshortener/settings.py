@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +42,8 @@ INSTALLED_APPS = [
     ]
 
 MIDDLEWARE = [
+    # First, so the time and queries of every other middleware are measured.
+    'shortener.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,6 +51,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'shortener.middleware.SamplingProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'urlshortener.urls'
@@ -81,6 +85,133 @@ DATABASES = {
     }
 }
 
+# Click analytics can live in their own SQLite file so click ingestion does
+# not contend for the write lock that redirects use. Set ANALYTICS_DB_PATH,
+# run `migrate --database analytics`, then `copy_analytics` to move history.
+
+ANALYTICS_DB_PATH = os.environ.get('ANALYTICS_DB_PATH', '')
+
+if ANALYTICS_DB_PATH:
+    DATABASES['analytics'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ANALYTICS_DB_PATH,
+    }
+
+DATABASE_ROUTERS = ['shortener.routers.AnalyticsRouter']
+
+# DB_PROFILE=production keeps connections open between requests and tunes
+# every new SQLite connection: WAL lets readers proceed while a click is
+# being written, synchronous=NORMAL is safe under WAL, and busy_timeout
+# makes writers wait for the lock instead of failing immediately.
+
+DB_PROFILE = os.environ.get('DB_PROFILE', 'development')
+
+SQLITE_PRAGMAS = {}
+
+if DB_PROFILE == 'production':
+    for database in DATABASES.values():
+        database['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', '600'))
+        database['CONN_HEALTH_CHECKS'] = True
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+        # Negative values are KiB: -65536 is a 64 MiB page cache per connection.
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', '-65536')),
+        'temp_store': 'MEMORY',
+    }
+
+
+# Cache
+# Shared by the redirect resolution cache, rate limits, API key revocation
+# and the dashboard. LocMemCache is only supported with a single process:
+# with more workers, point CACHE_BACKEND/CACHE_LOCATION at redis, memcached or
+# the database cache. `manage.py check --deploy` reports a process-local
+# cache; gunicorn.conf.py starts one worker unless CACHE_BACKEND is set and
+# refuses to start several workers on a process-local cache.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'urlshortener'),
+    }
+}
+
+# Host used in short links of URLs without a custom Domain, and the scheme of
+# every short link. Requests whose Host matches no Domain resolve codes in
+# this default namespace. Custom domains are kept in an in-process map; every
+# DOMAIN_MAP_REFRESH seconds each worker compares the table's count, highest
+# id and latest updated_at with the ones it loaded, so no shared cache is needed.
+DEFAULT_SHORT_DOMAIN = os.environ.get('DEFAULT_SHORT_DOMAIN', '127.0.0.1:8000')
+
+SHORT_URL_SCHEME = os.environ.get('SHORT_URL_SCHEME', 'http')
+
+DOMAIN_MAP_REFRESH = float(os.environ.get('DOMAIN_MAP_REFRESH', '5'))
+
+# Seconds a resolved short code stays cached (capped at the link's expiry).
+REDIRECT_CACHE_TTL = int(os.environ.get('REDIRECT_CACHE_TTL', '300'))
+
+# Seconds an unknown short code is remembered as missing.
+REDIRECT_NEGATIVE_CACHE_TTL = 30
+
+# Cache-Control for untracked links (URL.redirect_policy). Tracked and
+# password-protected links always send no-store. Use 308 instead of 301 to
+# keep the request method on permanent redirects.
+REDIRECT_PERMANENT_STATUS = int(os.environ.get('REDIRECT_PERMANENT_STATUS', '301'))
+
+REDIRECT_PERMANENT_MAX_AGE = int(os.environ.get('REDIRECT_PERMANENT_MAX_AGE', '86400'))
+
+REDIRECT_TEMPORARY_MAX_AGE = int(os.environ.get('REDIRECT_TEMPORARY_MAX_AGE', '300'))
+
+# Memory-mapped redirect index built by `manage.py build_redirect_index`
+# and shared by every worker through the page cache. Links changed after a
+# build are picked up from the change log every REDIRECT_INDEX_REFRESH
+# seconds and served from the cache/database until the next build.
+REDIRECT_INDEX_PATH = os.environ.get('REDIRECT_INDEX_PATH', '')
+
+REDIRECT_INDEX_REFRESH = float(os.environ.get('REDIRECT_INDEX_REFRESH', '5'))
+
+# Output of `manage.py export_redirect_map` (nginx map includes) and the
+# command run after a map file changes, e.g. "sudo nginx -s reload".
+REDIRECT_MAP_DIR = os.environ.get('REDIRECT_MAP_DIR', str(BASE_DIR / 'redirect_maps'))
+
+REDIRECT_MAP_RELOAD_COMMAND = os.environ.get('REDIRECT_MAP_RELOAD_COMMAND', '')
+
+# Seconds a user's dashboard stats stay cached. Link changes invalidate the
+# entry immediately; click counters (updated in bulk on redirect) may lag by
+# up to this long.
+DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', '60'))
+
+
+# API rate limits (sliding window, counted in the shared cache; with
+# LocMemCache each worker would enforce its own copy of every limit). The
+# monthly quota per key comes from UserProfile.api_calls_limit; each worker
+# adds the calls it served to UserProfile at most every
+# API_USAGE_FLUSH_INTERVAL seconds.
+
+RATE_LIMITS = {
+    'api_key': os.environ.get('RATE_LIMIT_API_KEY', '60/m'),
+    'anonymous': os.environ.get('RATE_LIMIT_ANONYMOUS', '10/m'),
+}
+
+API_USAGE_FLUSH_INTERVAL = 30
+
+# Number of reverse proxies in front of the app that append to
+# X-Forwarded-For. The client address (anonymous rate limit, click analytics)
+# is the entry the outermost of them appended; with 0 it is REMOTE_ADDR and
+# the header is ignored, since clients can set it to anything.
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', '0'))
+
+# API keys are stored as HMAC-SHA256 digests keyed with this secret.
+# Changing it invalidates every issued key.
+API_KEY_HASH_SECRET = os.environ.get('API_KEY_HASH_SECRET', SECRET_KEY)
+
+# Authenticated keys are kept in a per-process cache of this size and TTL.
+API_KEY_CACHE_SIZE = 10000
+
+API_KEY_CACHE_TTL = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -122,3 +253,125 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Request instrumentation (query counts, cache hits, external fetch time)
+# Emits Server-Timing headers and one JSON log line per request when enabled.
+
+PERF_INSTRUMENTATION = os.environ.get('PERF_INSTRUMENTATION', '') == '1'
+
+PERF_DEFAULT_THRESHOLDS = {
+    'db_queries': 25,
+    'db_ms': 200,
+    'total_ms': 1000,
+}
+
+# Per-view overrides keyed by URL name.
+PERF_VIEW_THRESHOLDS = {
+    'redirect_url': {'db_queries': 5, 'total_ms': 100},
+    'dashboard': {'db_queries': 15, 'db_ms': 100},
+    'url_analytics': {'db_queries': 15, 'db_ms': 150},
+}
+
+# Metrics exposition (Prometheus text format) at /metrics/.
+# With METRICS_DIR set, each worker process writes its samples there and
+# the endpoint aggregates them across all gunicorn workers.
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '') == '1'
+
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '1.0'))
+
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Sampling profiler: fraction of requests profiled per URL name. Dumps are
+# pstats files in PROFILE_DIR, rotated to PROFILE_MAX_FILES. Empty disables
+# the middleware entirely. Summarize with `manage.py profile_summary`.
+
+PROFILE_SAMPLE_RATES = {}
+if os.environ.get('PROFILE_SAMPLING', '') == '1':
+    PROFILE_SAMPLE_RATES = {
+        'redirect_url': float(os.environ.get('PROFILE_RATE_REDIRECT', '0.001')),
+        'dashboard': float(os.environ.get('PROFILE_RATE_DASHBOARD', '0.01')),
+        'url_analytics': float(os.environ.get('PROFILE_RATE_ANALYTICS', '0.01')),
+        'api_shorten': float(os.environ.get('PROFILE_RATE_API', '0.005')),
+    }
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR', str(BASE_DIR / 'profiles'))
+
+PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', '200'))
+
+# Worker startup budget enforced by `manage.py bench_startup` (median time
+# to set up Django and load the URLconf, and peak resident memory).
+STARTUP_IMPORT_BUDGET_MS = float(os.environ.get('STARTUP_IMPORT_BUDGET_MS', '500'))
+
+STARTUP_RSS_BUDGET_MB = float(os.environ.get('STARTUP_RSS_BUDGET_MB', '55'))
+
+# Rendered PDF reports, cached per (user, period) and data fingerprint.
+
+REPORTS_DIR = os.environ.get('REPORTS_DIR', str(BASE_DIR / 'reports'))
+
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', '2'))
+
+# Boot-time cache warm-up (see gunicorn.conf.py): hottest links primed into
+# the redirect cache, and the most frequent user agents / client IPs among
+# the last WARMUP_SAMPLE_CLICKS clicks of the last day parsed into the
+# in-process UA and GeoIP caches. 0 disables a step.
+WARMUP_LINKS = int(os.environ.get('WARMUP_LINKS', '1000'))
+
+WARMUP_USER_AGENTS = int(os.environ.get('WARMUP_USER_AGENTS', '500'))
+
+WARMUP_IP_ADDRESSES = int(os.environ.get('WARMUP_IP_ADDRESSES', '1000'))
+
+WARMUP_SAMPLE_CLICKS = int(os.environ.get('WARMUP_SAMPLE_CLICKS', '20000'))
+
+# Records processed per upload to the bulk import endpoint; the response
+# carries the position to resend the file from. The import_links management
+# command has no such limit.
+IMPORT_UPLOAD_MAX_ROWS = int(os.environ.get('IMPORT_UPLOAD_MAX_ROWS', '50000'))
+
+# Destination health checks (`manage.py check_links`). Requests in flight
+# overall and per destination host, a global cap in requests per second, and
+# the per-check timeout in seconds.
+LINK_HEALTH_CONCURRENCY = int(os.environ.get('LINK_HEALTH_CONCURRENCY', '1000'))
+
+LINK_HEALTH_PER_HOST = int(os.environ.get('LINK_HEALTH_PER_HOST', '4'))
+
+LINK_HEALTH_RATE = float(os.environ.get('LINK_HEALTH_RATE', '200'))
+
+LINK_HEALTH_TIMEOUT = float(os.environ.get('LINK_HEALTH_TIMEOUT', '10'))
+
+# Seconds between checks by click count (first matching threshold wins).
+# Failing links are retried after LINK_HEALTH_RETRY seconds, doubling on each
+# consecutive failure, but never later than their regular interval.
+LINK_HEALTH_INTERVALS = [
+    (1000, 3600),
+    (100, 6 * 3600),
+    (1, 24 * 3600),
+    (0, 7 * 24 * 3600),
+]
+
+LINK_HEALTH_RETRY = int(os.environ.get('LINK_HEALTH_RETRY', '900'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'shortener.perf': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'shortener.warmup': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}